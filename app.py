@@ -1,6 +1,8 @@
 import streamlit as st
 from config import Config
 import os
+from utils.persistence import persist_profile, restore_session
+from utils.quiz_stats import session_statistics
 
 # Configuration de la page
 st.set_page_config(
@@ -43,6 +45,8 @@ def load_css():
 
 def initialize_session_state():
     """Initialiser les variables de session"""
+    # Recharger les données sauvegardées de l'utilisateur (une fois par session)
+    restore_session()
     if "profile" not in st.session_state:
         st.session_state.profile = None
     if "discipline" not in st.session_state:
@@ -133,6 +137,8 @@ def main():
                 ),
             )
 
+        persist_profile()
+
         st.divider()
 
         # Section 3: Navigation
@@ -167,14 +173,12 @@ def main():
             st.divider()
 
             st.markdown("### 📊 Statistiques")
+            stats = session_statistics()
             st.metric("Documents uploadés", len(st.session_state.documents))
-            st.metric("Quiz complétés", len(st.session_state.quiz_results))
+            st.metric("Quiz complétés", stats.count)
 
-            if st.session_state.quiz_results:
-                avg_score = sum(
-                    r.get("score", 0) for r in st.session_state.quiz_results
-                ) / len(st.session_state.quiz_results)
-                st.metric("Score moyen", f"{avg_score:.1f}/20")
+            if stats.count:
+                st.metric("Score moyen", f"{stats.average_score:.1f}/20")
 
     else:
         st.info("👆 Veuillez sélectionner votre profil pour continuer")
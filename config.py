@@ -25,6 +25,17 @@ class Config:
         "xai": "grok-beta",
     }
 
+    # Limites de chaque modèle (tokens) : fenêtre de contexte et sortie max
+    MODEL_LIMITS = {
+        "deepseek": {"context_window": 64000, "max_output": 8192},
+        "groq": {"context_window": 131072, "max_output": 32768},
+        "together": {"context_window": 131072, "max_output": 4096},
+        "openai": {"context_window": 128000, "max_output": 16384},
+        "xai": {"context_window": 131072, "max_output": 4096},
+    }
+    # Taille maximale du contexte document envoyé dans un prompt (tokens)
+    MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "12000"))
+
     # App Configuration
     APP_ENV = os.getenv("APP_ENV", "development")
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -33,6 +44,82 @@ class Config:
     APP_TITLE = "MentorAI - Apprentissage Universitaire"
     MAX_FILE_SIZE = 10  # MB
 
+    # Repli entre providers et requêtes de couverture (hedging)
+    PROVIDER_FAILOVER = os.getenv("PROVIDER_FAILOVER", "True").lower() == "true"
+    PROVIDER_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_TIMEOUT_SECONDS", "90"))
+    PROVIDER_MAX_FAILURES = int(os.getenv("PROVIDER_MAX_FAILURES", "2"))
+    PROVIDER_COOLDOWN_SECONDS = float(os.getenv("PROVIDER_COOLDOWN_SECONDS", "60"))
+    HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "False").lower() == "true"
+    HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "2"))
+    HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "15"))
+
+    # Cache d'extraction des documents
+    EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "32"))
+    EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", "")  # vide = mémoire seule
+
+    # Ingestion parallèle des documents
+    EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "4"))  # processus
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))  # appels AI
+
+    # Résumé hiérarchique (map-reduce) des longs documents
+    SUMMARY_MODE = os.getenv("SUMMARY_MODE", "map_reduce")  # "map_reduce" ou "direct"
+    # Appels simultanés au plus (un long document a plus de parties, pas plus longues)
+    SUMMARY_MAX_CHUNKS = int(os.getenv("SUMMARY_MAX_CHUNKS", "8"))
+    SUMMARY_CHUNK_WORDS = int(os.getenv("SUMMARY_CHUNK_WORDS", "1500"))  # maximum
+
+    # Index de recherche (choix du contexte des quiz)
+    RETRIEVAL_CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "200"))
+
+    # Génération des grands quiz en parallèle, par lots de questions
+    QUIZ_SHARD_SIZE = int(os.getenv("QUIZ_SHARD_SIZE", "10"))
+
+    # Stockage des profils, documents et résultats ("sqlite" ou "json")
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "sqlite")
+    # Écriture différée depuis les pages (file bornée, vidée par lots)
+    PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "1000"))
+    PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "1"))
+    # Backend json : compacter le journal des résultats toutes les N entrées
+    RESULT_LOG_COMPACT_EVERY = int(os.getenv("RESULT_LOG_COMPACT_EVERY", "200"))
+
+    # Banque de questions (les quiz sont tirés de la banque avant d'appeler l'AI)
+    QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "True").lower() == "true"
+    QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "data/question_bank.sqlite")
+
+    # Détection des questions quasi identiques (MinHash/LSH)
+    DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # Jaccard
+    MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "128"))
+
+    # Correction des questions ouvertes (accents ignorés, racinisation)
+    OPEN_ANSWER_FOLD_ACCENTS = (
+        os.getenv("OPEN_ANSWER_FOLD_ACCENTS", "False").lower() == "true"
+    )
+    OPEN_ANSWER_STEMMING = os.getenv("OPEN_ANSWER_STEMMING", "False").lower() == "true"
+
+    # Maîtrise des compétences : demi-vie du poids d'un résultat (jours)
+    COMPETENCE_HALF_LIFE_DAYS = float(os.getenv("COMPETENCE_HALF_LIFE_DAYS", "30"))
+
+    # Recommandations réutilisées tant que les résultats changent peu :
+    # régénérées après N nouveaux quiz ou si la moyenne bouge d'au moins X/20
+    RECOMMENDATIONS_MAX_NEW_RESULTS = int(
+        os.getenv("RECOMMENDATIONS_MAX_NEW_RESULTS", "5")
+    )
+    RECOMMENDATIONS_SCORE_TOLERANCE = float(
+        os.getenv("RECOMMENDATIONS_SCORE_TOLERANCE", "0.5")
+    )
+
+    # Graphiques des historiques longs (sous-échantillonnage LTTB, WebGL)
+    CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1500"))
+    CHART_WEBGL_THRESHOLD = int(os.getenv("CHART_WEBGL_THRESHOLD", "1000"))
+
+    # Cache des réponses AI
+    RESPONSE_CACHE_ENABLED = (
+        os.getenv("RESPONSE_CACHE_ENABLED", "True").lower() == "true"
+    )
+    RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "data/llm_cache.sqlite")
+    RESPONSE_CACHE_TTL_HOURS = float(os.getenv("RESPONSE_CACHE_TTL_HOURS", "168"))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+
     # ... reste du config
     PROFILES = ["Étudiant", "Enseignant", "Chercheur"]
     DISCIPLINES = [
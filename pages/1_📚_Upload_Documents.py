@@ -1,14 +1,16 @@
 import streamlit as st
 from utils.document_processor import DocumentProcessor
-from utils.ai_generator import AIGenerator
+from utils.ai_generator import AIGenerator, render_messages
+from utils.ingestion import ingest_documents
+from utils.persistence import persist_documents, restore_session
 from config import Config
-import time
 
 st.set_page_config(page_title="Upload Documents", page_icon="📚", layout="wide")
 
 
 def main():
     st.title("📚 Upload et Analyse de Documents")
+    restore_session()
 
     # Vérifier le profil
     if not st.session_state.get("profile"):
@@ -25,6 +27,9 @@ def main():
 
     st.divider()
 
+    # Avertissements de la dernière analyse (affichés après le rerun)
+    render_messages(st.session_state.pop("summary_messages", []))
+
     # Upload de fichiers
     st.markdown("### 📤 Uploadez vos documents")
 
@@ -41,12 +46,17 @@ def main():
         col1, col2 = st.columns([3, 1])
 
         with col2:
+            regenerate = st.checkbox(
+                "Régénérer les résumés",
+                value=False,
+                help="Ignorer les résumés déjà générés pour ces documents",
+            )
             if st.button(
                 "🔄 Analyser tous les documents",
                 type="primary",
                 use_container_width=True,
             ):
-                process_documents(uploaded_files)
+                process_documents(uploaded_files, bypass_cache=regenerate)
 
         st.divider()
 
@@ -83,11 +93,18 @@ def main():
                 if "summary" in doc and doc["summary"]:
                     summary = doc["summary"]
 
-                    # Bouton de suppression en haut
-                    col_del1, col_del2 = st.columns([5, 1])
+                    # Boutons de régénération et de suppression en haut
+                    col_del1, col_regen, col_del2 = st.columns([4, 1, 1])
+                    with col_regen:
+                        # Le texte des documents rechargés n'est pas conservé
+                        if doc.get("text") and st.button(
+                            "🔄 Régénérer", key=f"regen_{idx}"
+                        ):
+                            regenerate_summary(doc)
                     with col_del2:
                         if st.button("🗑️ Supprimer", key=f"del_{idx}"):
                             st.session_state.documents.pop(idx)
+                            persist_documents()
                             st.rerun()
 
                     # Tabs pour organiser l'information
@@ -286,46 +303,56 @@ def main():
                     )
                     if st.button("🗑️ Supprimer", key=f"del_no_summary_{idx}"):
                         st.session_state.documents.pop(idx)
+                        persist_documents()
                         st.rerun()
 
 
-def process_documents(files):
+def process_documents(files, bypass_cache=False):
     """Traiter et analyser les documents uploadés"""
-    ai_gen = AIGenerator()
-    processor = DocumentProcessor()
+    ai_gen = AIGenerator(bypass_cache=bypass_cache)
 
     progress_bar = st.progress(0)
     status_text = st.empty()
+    status_text.text(f"Traitement de {len(files)} document(s)...")
+
+    def on_progress(done, total, name):
+        progress_bar.progress(done / total)
+        status_text.text(f"✅ {name} traité ({done}/{total})")
+
+    documents = ingest_documents(
+        files,
+        ai_gen,
+        st.session_state.discipline,
+        st.session_state.niveau,
+        on_progress=on_progress,
+    )
 
-    for idx, file in enumerate(files):
-        status_text.text(f"Traitement de {file.name}...")
-
-        # Extraire le texte
-        doc_info = processor.process_document(file)
-
-        if doc_info:
-            # Générer le résumé avec AI
-            status_text.text(f"Génération du résumé pour {file.name}...")
-            summary = ai_gen.generate_summary(
-                doc_info["text"],
-                st.session_state.discipline,
-                st.session_state.niveau,
-                doc_info.get("page_count", 0),
-            )
-
-            doc_info["summary"] = summary
-
-            # Ajouter à la session
-            st.session_state.documents.append(doc_info)
-
-        progress_bar.progress((idx + 1) / len(files))
+    # Ajouter à la session
+    st.session_state.documents.extend(documents)
+    persist_documents()
+    st.session_state.summary_messages = ai_gen.pop_messages()
 
-    status_text.text("✅ Tous les documents ont été traités!")
-    time.sleep(1)
     progress_bar.empty()
     status_text.empty()
     st.rerun()
 
 
+def regenerate_summary(doc):
+    """Refaire le résumé d'un document sans passer par le cache"""
+    ai_gen = AIGenerator(bypass_cache=True)
+    with st.spinner(f"Régénération du résumé de {doc['name']}..."):
+        summary = ai_gen.generate_summary(
+            doc["text"],
+            st.session_state.discipline,
+            st.session_state.niveau,
+            doc.get("page_count", 0),
+        )
+    if summary:
+        doc["summary"] = summary
+        persist_documents()
+    st.session_state.summary_messages = ai_gen.pop_messages()
+    st.rerun()
+
+
 if __name__ == "__main__":
     main()
@@ -1,15 +1,25 @@
 import streamlit as st
 from utils.ai_generator import AIGenerator
 from utils.quiz_manager import QuizManager
+from utils.question_bank import document_hash, get_question_bank
+from utils.quiz_stream import QuizStream
+from utils.retrieval import DocumentIndex
+from utils.persistence import persist_quiz_result, restore_session
 from config import Config
+import itertools
+import random
 import time
 from datetime import datetime
 
 st.set_page_config(page_title="Générer Quiz", page_icon="📝", layout="wide")
 
+# Appels AI supplémentaires pour compléter un quiz resté incomplet
+MAX_TOP_UP_ROUNDS = 2
+
 
 def main():
     st.title("📝 Génération et Passage de Quiz")
+    restore_session()
 
     # Vérifier le profil et les documents
     if not st.session_state.get("profile"):
@@ -18,7 +28,8 @@ def main():
             st.switch_page("app.py")
         return
 
-    if not st.session_state.get("documents"):
+    # Documents restaurés d'une session précédente : texte non sauvegardé
+    if not any(doc.get("text") for doc in st.session_state.get("documents", [])):
         st.warning("⚠️ Veuillez d'abord uploader des documents")
         if st.button("📚 Aller à Upload Documents"):
             st.switch_page("pages/1_📚_Upload_Documents.py")
@@ -47,6 +58,10 @@ def main():
         st.session_state.user_answers = {}
     if "start_time" not in st.session_state:
         st.session_state.start_time = None
+    if "quiz_stream" not in st.session_state:
+        st.session_state.quiz_stream = None
+    if "quiz_generators" not in st.session_state:
+        st.session_state.quiz_generators = []
 
     # Interface principale
     if not st.session_state.quiz_started:
@@ -63,7 +78,8 @@ def show_quiz_configuration():
 
     with col1:
         st.markdown("#### 📚 Sélection du document")
-        doc_names = [doc["name"] for doc in st.session_state.documents]
+        documents = [doc for doc in st.session_state.documents if doc.get("text")]
+        doc_names = [doc["name"] for doc in documents]
         selected_doc_name = st.selectbox(
             "Document source",
             doc_names,
@@ -71,7 +87,7 @@ def show_quiz_configuration():
         )
         selected_doc = next(
             doc
-            for doc in st.session_state.documents
+            for doc in documents
             if doc["name"] == selected_doc_name
         )
 
@@ -85,6 +101,11 @@ def show_quiz_configuration():
             "Niveau de difficulté", Config.DIFFICULTIES, horizontal=True
         )
 
+        focus = st.text_input(
+            "Thème ciblé (optionnel)",
+            help="Mots-clés pour concentrer le quiz sur une partie du document",
+        )
+
         st.markdown("#### 🎲 Nombre de questions")
         num_questions = st.slider(
             "Questions à générer", min_value=5, max_value=50, value=15, step=5
@@ -120,6 +141,11 @@ def show_quiz_configuration():
         )
         shuffle_questions = st.checkbox("Mélanger l'ordre des questions", value=True)
         shuffle_options = st.checkbox("Mélanger l'ordre des réponses", value=True)
+        force_regenerate = st.checkbox(
+            "Générer de nouvelles questions",
+            value=False,
+            help="Ignorer les quiz déjà générés avec les mêmes paramètres",
+        )
 
     st.divider()
 
@@ -141,6 +167,8 @@ def show_quiz_configuration():
                 show_explanations,
                 shuffle_questions,
                 shuffle_options,
+                force_regenerate,
+                focus,
             )
 
 
@@ -155,22 +183,102 @@ def generate_and_start_quiz(
     show_explanations,
     shuffle_questions,
     shuffle_options,
+    force_regenerate=False,
+    focus="",
 ):
     """Générer et démarrer un nouveau quiz"""
     with st.spinner("🎲 Génération du quiz en cours..."):
-        ai_gen = AIGenerator()
-
-        # Générer les questions
-        questions = ai_gen.generate_quiz(
-            doc["text"],
-            quiz_type,
-            difficulty,
-            num_questions,
-            st.session_state.discipline,
-        )
+        bank = get_question_bank()
+        doc_hash = document_hash(doc)
+        user_id = st.session_state.get("user_id")
+
+        # Tirer d'abord des questions de la banque jamais vues par l'utilisateur
+        # (un thème ciblé demande des questions générées pour l'occasion)
+        banked = []
+        if bank is not None and not force_regenerate and not focus:
+            banked = bank.sample(
+                doc_hash, quiz_type, difficulty, num_questions, user_id=user_id
+            )
+        questions = iter(banked)
+        # Générateurs utilisés : leurs avertissements sont affichés par la page
+        generators = []
+
+        missing = num_questions - len(banked)
+        if missing > 0:
+            # Banque entamée : ne pas rejouer une réponse en cache déjà en banque
+            bypass_cache = force_regenerate or (
+                bank is not None and bank.count(doc_hash, quiz_type, difficulty) > 0
+            )
 
-        if questions:
-            # Créer le quiz
+            # Documents chargés avant l'indexation : construire l'index une fois
+            if doc.get("index") is None:
+                doc["index"] = DocumentIndex.from_text(doc["text"])
+
+            # Les appels suivants sont faits depuis le thread de QuizStream :
+            # lire la session maintenant
+            discipline = st.session_state.discipline
+
+            def generate(count, bypass):
+                ai_gen = AIGenerator(bypass_cache=bypass)
+                generators.append(ai_gen)
+                generated = ai_gen.stream_quiz(
+                    doc["text"],
+                    quiz_type,
+                    difficulty,
+                    count,
+                    discipline,
+                    index=doc["index"],
+                    focus=focus or None,
+                )
+                if bank is None:
+                    return generated
+                return bank.collect(
+                    generated,
+                    doc_hash,
+                    quiz_type,
+                    difficulty,
+                    user_id=user_id,
+                    limit=count,
+                    exclude=in_quiz,
+                )
+
+            def top_up():
+                # Compléter si des questions générées étaient déjà dans le
+                # quiz (la banque écarte les doublons d'un appel à l'autre)
+                produced = 0
+                rounds = 1 + (MAX_TOP_UP_ROUNDS if bank is not None else 0)
+                for round_ in range(rounds):
+                    if produced >= missing:
+                        return
+                    # Un nouvel appel ne doit pas rejouer la réponse en cache
+                    bypass = bypass_cache or round_ > 0
+                    for question in generate(missing - produced, bypass):
+                        produced += 1
+                        yield question
+
+            in_quiz = {q["bank_id"] for q in banked}
+            generated = top_up()
+            questions = itertools.chain(questions, generated)
+
+        def prepare_question(q):
+            # Mélanger les options au fil de l'arrivée des questions
+            if q.get("type") == "qcm" and "options" in q:
+                # Sauvegarder la bonne réponse AVANT de mélanger
+                correct_answer_text = q["correct_answer"]
+                random.shuffle(q["options"])
+                # La bonne réponse reste la même (le texte ne change pas)
+                q["correct_answer"] = correct_answer_text
+
+        # Les questions arrivent en streaming : le quiz démarre à la première
+        stream = QuizStream(
+            questions,
+            prepare=prepare_question if shuffle_options else None,
+            shuffle=shuffle_questions,
+        ).start()
+        stream.wait_for(1)
+
+        if stream.questions:
+            # Créer le quiz (la liste des questions se complète en arrière-plan)
             quiz = {
                 "id": f"quiz_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
                 "document": doc["name"],
@@ -180,46 +288,49 @@ def generate_and_start_quiz(
                 "bareme": bareme,
                 "time_limit": time_limit,
                 "show_explanations": show_explanations,
-                "questions": questions,
+                "questions": stream.questions,
                 "created_at": datetime.now().isoformat(),
             }
 
-            # Mélanger si nécessaire
-            if shuffle_questions:
-                import random
-
-                random.shuffle(quiz["questions"])
-
-            if shuffle_options:
-                import random
-
-                for q in quiz["questions"]:
-                    if q["type"] == "qcm" and "options" in q:
-                        # Sauvegarder la bonne réponse AVANT de mélanger
-                        correct_answer_text = q["correct_answer"]
-                        random.shuffle(q["options"])
-                        # La bonne réponse reste la même (le texte ne change pas)
-                        q["correct_answer"] = correct_answer_text
-
             # Sauvegarder le quiz
             st.session_state.current_quiz = quiz
+            st.session_state.quiz_stream = stream
+            st.session_state.quiz_generators = generators
             st.session_state.quiz_started = True
             st.session_state.current_question_idx = 0
             st.session_state.user_answers = {}
             st.session_state.start_time = datetime.now()
 
-            st.success("✅ Quiz généré avec succès!")
-            time.sleep(1)
             st.rerun()
         else:
+            show_generation_messages(stream, generators)
             st.error("❌ Erreur lors de la génération du quiz")
 
 
+def show_generation_messages(stream, generators):
+    """Afficher les erreurs et avertissements de la génération
+
+    Les questions sont produites dans le thread de QuizStream : les
+    messages y sont collectés et affichés ici, dans le thread de la page.
+    """
+    for ai_gen in generators:
+        ai_gen.show_messages()
+    if stream is not None and stream.error is not None:
+        st.error(f"Erreur lors de la génération des questions : {stream.error}")
+
+
 def show_quiz_interface():
     """Afficher l'interface du quiz en cours"""
     quiz = st.session_state.current_quiz
     current_idx = st.session_state.current_question_idx
 
+    # Questions encore en cours de génération ?
+    stream = st.session_state.get("quiz_stream")
+    generating = stream is not None and not stream.done
+    if stream is not None:
+        stream.lock_until(current_idx + 1)
+    show_generation_messages(stream, st.session_state.quiz_generators)
+
     # Header avec progression
     col1, col2, col3 = st.columns([2, 1, 1])
 
@@ -227,6 +338,8 @@ def show_quiz_interface():
         progress = (current_idx + 1) / len(quiz["questions"])
         st.progress(progress)
         st.caption(f"Question {current_idx + 1} / {len(quiz['questions'])}")
+        if generating:
+            st.caption("⏳ Génération des questions suivantes en cours...")
 
     with col2:
         # Timer
@@ -286,11 +399,17 @@ def show_quiz_interface():
                     time.sleep(0.5)
 
         with col3:
-            if current_idx < len(quiz["questions"]) - 1:
+            if current_idx < len(quiz["questions"]) - 1 or generating:
                 if st.button("Question Suivante ➡️", use_container_width=True):
                     if answer:
                         st.session_state.user_answers[current_idx] = answer
-                    st.session_state.current_question_idx += 1
+                    if generating:
+                        with st.spinner(
+                            "⏳ Question suivante en cours de génération..."
+                        ):
+                            stream.wait_for(current_idx + 2, timeout=60)
+                    if current_idx < len(quiz["questions"]) - 1:
+                        st.session_state.current_question_idx += 1
                     st.rerun()
             else:
                 if st.button(
@@ -336,7 +455,9 @@ def finish_quiz():
     # Sauvegarder les résultats
     result["end_time"] = datetime.now().isoformat()
     result["duration"] = (datetime.now() - st.session_state.start_time).seconds // 60
+    result["document"] = quiz["document"]
     st.session_state.quiz_results.append(result)
+    persist_quiz_result(result)
 
     # Réinitialiser
     reset_quiz()
@@ -348,6 +469,8 @@ def finish_quiz():
 def reset_quiz():
     """Réinitialiser l'état du quiz"""
     st.session_state.current_quiz = None
+    st.session_state.quiz_stream = None
+    st.session_state.quiz_generators = []
     st.session_state.quiz_started = False
     st.session_state.current_question_idx = 0
     st.session_state.user_answers = {}
@@ -1,14 +1,25 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
+from utils.persistence import restore_session
+from utils.quiz_stats import session_statistics
+from utils.charts import detail_window
+from utils.competence_analytics import session_competences
+from utils.results_analytics import (
+    competence_bar_figure,
+    competence_radar_figure,
+    evolution_figure,
+    mentions_figure,
+    results_snapshot,
+)
 from datetime import datetime
 
 st.set_page_config(page_title="Résultats", page_icon="📊", layout="wide")
 
+DETAILS_PAGE_SIZE = 10
+
 
 def main():
     st.title("📊 Résultats et Analyse")
+    restore_session()
 
     if not st.session_state.get("profile"):
         st.warning("⚠️ Veuillez d'abord sélectionner votre profil")
@@ -41,18 +52,18 @@ def main():
 
 def show_overview():
     """Afficher la vue d'ensemble des résultats"""
-    results = st.session_state.quiz_results
+    stats = session_statistics()
 
     # Statistiques globales
     st.markdown("### 📊 Statistiques Globales")
 
     col1, col2, col3, col4 = st.columns(4)
 
-    # Calculs
-    total_quizzes = len(results)
-    avg_score = sum(r["score"] for r in results) / total_quizzes
-    avg_percentage = sum(r["percentage"] for r in results) / total_quizzes
-    total_time = sum(r.get("duration", 0) for r in results)
+    # Calculs (agrégats tenus à jour à chaque nouveau résultat)
+    total_quizzes = stats.count
+    avg_score = stats.average_score
+    avg_percentage = stats.average_percentage
+    total_time = stats.duration_sum
 
     with col1:
         st.metric("🎯 Quiz Complétés", total_quizzes)
@@ -75,72 +86,16 @@ def show_overview():
     with col1:
         st.markdown("#### 📈 Évolution des Scores")
 
-        # Graphique d'évolution
-        df = pd.DataFrame(
-            [
-                {
-                    "Quiz": f"Quiz {i+1}",
-                    "Score": r["score"],
-                    "Date": r.get("end_time", "")[:10],
-                }
-                for i, r in enumerate(results)
-            ]
-        )
-
-        fig = go.Figure()
-        fig.add_trace(
-            go.Scatter(
-                x=df["Quiz"],
-                y=df["Score"],
-                mode="lines+markers",
-                name="Score",
-                line=dict(color="#1f77b4", width=3),
-                marker=dict(size=10),
-            )
-        )
-        fig.add_hline(
-            y=10,
-            line_dash="dash",
-            line_color="red",
-            annotation_text="Seuil de réussite",
-        )
-        fig.update_layout(
-            xaxis_title="Quiz",
-            yaxis_title="Score (/20)",
-            yaxis_range=[0, 20],
-            height=400,
-        )
+        # Graphique d'évolution (recalculé seulement après un nouveau quiz)
+        snapshot = results_snapshot()
+        window = detail_window(len(snapshot.results), key="overview_window")
+        fig = evolution_figure(snapshot, window)
         st.plotly_chart(fig, use_container_width=True, key="overview_evolution_chart")
 
     with col2:
         st.markdown("#### 🎯 Répartition des Mentions")
 
-        # Calculer les mentions
-        mentions = {
-            "Excellent (≥16)": sum(1 for r in results if r["score"] >= 16),
-            "Très Bien (14-16)": sum(1 for r in results if 14 <= r["score"] < 16),
-            "Bien (12-14)": sum(1 for r in results if 12 <= r["score"] < 14),
-            "Assez Bien (10-12)": sum(1 for r in results if 10 <= r["score"] < 12),
-            "Insuffisant (<10)": sum(1 for r in results if r["score"] < 10),
-        }
-
-        fig = go.Figure(
-            data=[
-                go.Pie(
-                    labels=list(mentions.keys()),
-                    values=list(mentions.values()),
-                    hole=0.3,
-                    marker_colors=[
-                        "#2ecc71",
-                        "#3498db",
-                        "#f39c12",
-                        "#e67e22",
-                        "#e74c3c",
-                    ],
-                )
-            ]
-        )
-        fig.update_layout(height=400)
+        fig = mentions_figure(stats.mentions)
         st.plotly_chart(fig, use_container_width=True, key="overview_mentions_pie")
 
     st.divider()
@@ -148,7 +103,7 @@ def show_overview():
     # Derniers résultats
     st.markdown("### 📋 Derniers Résultats")
 
-    latest = results[-1]
+    latest = stats.last
 
     st.markdown(
         f"""
@@ -178,7 +133,21 @@ def show_quiz_details():
     """Afficher les détails de chaque quiz"""
     results = st.session_state.quiz_results
 
-    for idx, result in enumerate(reversed(results)):
+    # Quiz affichés par page, du plus récent au plus ancien
+    pages = (len(results) - 1) // DETAILS_PAGE_SIZE + 1
+    page = 1
+    if pages > 1:
+        page = st.selectbox(
+            "Page",
+            range(1, pages + 1),
+            format_func=lambda p: f"Page {p}/{pages}",
+            key="quiz_details_page",
+        )
+    first = (page - 1) * DETAILS_PAGE_SIZE
+    end = len(results) - first
+    shown = results[max(end - DETAILS_PAGE_SIZE, 0) : end]
+
+    for idx, result in enumerate(reversed(shown), start=first):
         with st.expander(
             f"📝 Quiz #{len(results) - idx} - Score: {result['score']:.1f}/20",
             expanded=(idx == 0),
@@ -204,19 +173,7 @@ def show_quiz_details():
             if "competence_breakdown" in result:
                 st.markdown("#### 📊 Analyse par Compétence")
 
-                comp_data = result["competence_breakdown"]
-                df_comp = pd.DataFrame(
-                    [{"Compétence": k, "Score": v} for k, v in comp_data.items()]
-                )
-
-                fig = px.bar(
-                    df_comp,
-                    x="Compétence",
-                    y="Score",
-                    color="Score",
-                    color_continuous_scale="RdYlGn",
-                )
-                fig.update_layout(height=300)
+                fig = competence_bar_figure(result["competence_breakdown"])
                 st.plotly_chart(
                     fig, use_container_width=True, key=f"quiz_detail_comp_{idx}"
                 )
@@ -255,42 +212,16 @@ def show_quiz_details():
 
 def show_competence_analysis():
     """Analyser les performances par compétence"""
-    results = st.session_state.quiz_results
-
     st.markdown("### 🎯 Analyse Détaillée par Compétence")
 
-    # Agréger les données par compétence
-    all_competences = {}
-
-    for result in results:
-        if "competence_breakdown" in result:
-            for comp, score in result["competence_breakdown"].items():
-                if comp not in all_competences:
-                    all_competences[comp] = []
-                all_competences[comp].append(score)
+    # Maîtrise pondérée par l'ancienneté (résultats récents prépondérants)
+    summary = session_competences().summary()
 
-    if all_competences:
-        # Calcul des moyennes
-        comp_averages = {
-            comp: sum(scores) / len(scores) for comp, scores in all_competences.items()
-        }
+    if summary:
 
         # Graphique radar
-        categories = list(comp_averages.keys())
-        values = list(comp_averages.values())
-
-        fig = go.Figure()
-
-        fig.add_trace(
-            go.Scatterpolar(
-                r=values, theta=categories, fill="toself", name="Vos Performances"
-            )
-        )
-
-        fig.update_layout(
-            polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-            showlegend=True,
-            height=500,
+        fig = competence_radar_figure(
+            {comp: values["mastery"] for comp, values in summary.items()}
         )
 
         st.plotly_chart(fig, use_container_width=True, key="competence_radar_chart")
@@ -300,19 +231,28 @@ def show_competence_analysis():
         # Détails par compétence
         st.markdown("#### 📋 Détails par Compétence")
 
-        for comp, avg in sorted(
-            comp_averages.items(), key=lambda x: x[1], reverse=True
+        for comp, values in sorted(
+            summary.items(), key=lambda x: x[1]["mastery"], reverse=True
         ):
+            avg = values["mastery"]
             col1, col2, col3 = st.columns([2, 1, 1])
 
             with col1:
                 st.markdown(f"**{comp}**")
+                st.caption(
+                    f"Intervalle de confiance 95 % : {values['low']:.0f}–"
+                    f"{values['high']:.0f}% ({values['count']} quiz)"
+                )
 
             with col2:
                 st.progress(avg / 100)
 
             with col3:
-                st.metric("Score moyen", f"{avg:.1f}%")
+                st.metric(
+                    "Maîtrise",
+                    f"{avg:.1f}%",
+                    delta=f"{values['trend']:+.1f} pts/semaine",
+                )
 
             # Recommandation
             if avg < 50:
@@ -1,12 +1,22 @@
 import streamlit as st
 from utils.ai_generator import AIGenerator
-import plotly.graph_objects as go
+from utils.persistence import persist_recommendations, restore_session
+from utils.quiz_stats import session_statistics
+from utils.charts import detail_window
+from utils.recommendation_cache import is_stale, recommendations_fingerprint
+from utils.competence_analytics import session_competences
+from utils.results_analytics import (
+    projection_figure,
+    results_snapshot,
+    score_projection,
+)
 
 st.set_page_config(page_title="Recommandations", page_icon="💡", layout="wide")
 
 
 def main():
     st.title("💡 Recommandations Personnalisées")
+    restore_session()
 
     if not st.session_state.get("profile"):
         st.warning("⚠️ Veuillez d'abord sélectionner votre profil")
@@ -22,10 +32,9 @@ def main():
 
     st.divider()
 
-    # Générer les recommandations
-    if "recommendations" not in st.session_state:
-        with st.spinner("🤖 Génération de recommandations personnalisées..."):
-            generate_recommendations()
+    # Générer les recommandations (réutilisées tant que les résultats
+    # n'ont pas sensiblement changé)
+    generate_recommendations()
 
     recommendations = st.session_state.get("recommendations")
 
@@ -115,6 +124,7 @@ def main():
         with col1:
             if st.button("🔄 Régénérer les Recommandations", use_container_width=True):
                 del st.session_state["recommendations"]
+                st.session_state.regenerate_recommendations = True
                 st.rerun()
 
         with col2:
@@ -130,55 +140,86 @@ def main():
 
 
 def generate_recommendations():
-    """Générer les recommandations avec AI"""
+    """Générer les recommandations avec AI
+
+    Les dernières recommandations sont gardées avec l'empreinte des données
+    envoyées ; l'appel AI n'est refait que si elles sont périmées ou sur
+    demande (bouton « Régénérer »).
+    """
+    fingerprint = None
     try:
-        ai_gen = AIGenerator()
+        regenerate = st.session_state.pop("regenerate_recommendations", False)
+        ai_gen = AIGenerator(bypass_cache=regenerate)
         results = st.session_state.quiz_results
-
-        # Identifier les points faibles
-        weak_areas = []
-        for result in results:
-            if "competence_breakdown" in result:
-                for comp, score in result["competence_breakdown"].items():
-                    if score < 60:
-                        weak_areas.append(comp)
-
-        # Ajouter aussi les weak_areas de chaque résultat
-        for result in results:
-            if "weak_areas" in result:
-                weak_areas.extend(result["weak_areas"])
+        stats = session_statistics()
+
+        # Points faibles : compétences les moins maîtrisées (sous 60 %)
+        # puis questions ratées
+        weak_areas = session_competences().weak_areas()
+        weak_areas += stats.weak_questions[: 5 - len(weak_areas)]
+
+        fingerprint = recommendations_fingerprint(
+            stats.count,
+            stats.average_score,
+            weak_areas,
+            ai_gen.provider,
+            ai_gen.model,
+        )
+        if not regenerate:
+            for entry in (
+                st.session_state.get("recommendations_entry"),
+                st.session_state.get("saved_recommendations"),
+            ):
+                if not is_stale(entry, fingerprint):
+                    st.session_state.recommendations = entry["recommendations"]
+                    st.session_state.recommendations_entry = entry
+                    return
 
         # Générer les recommandations
-        recommendations = ai_gen.generate_recommendations(results, weak_areas)
+        with st.spinner("🤖 Génération de recommandations personnalisées..."):
+            recommendations = ai_gen.generate_recommendations(
+                results, weak_areas, average_score=stats.average_score
+            )
+        ai_gen.show_messages()
 
         # Vérifier que les recommandations ne sont pas None
         if recommendations is None:
             st.error("Erreur lors de la génération des recommandations")
-            recommendations = {
-                "points_a_revoir": [],
-                "exercices_recommandes": ["Refaire les exercices du cours"],
-                "ressources": [],
-                "strategies": ["Relire régulièrement", "Pratiquer avec des exercices"],
-                "planning": {
-                    "semaine_1": ["Revoir les cours"],
-                    "semaine_2": ["Faire des exercices"],
-                },
-            }
+            recommendations = default_recommendations()
+        else:
+            persist_recommendations(
+                {"fingerprint": fingerprint, "recommendations": recommendations}
+            )
 
+        # Recommandations par défaut gardées pour la session seulement
         st.session_state.recommendations = recommendations
+        st.session_state.recommendations_entry = {
+            "fingerprint": fingerprint,
+            "recommendations": recommendations,
+        }
     except Exception as e:
         st.error(f"Erreur lors de la génération: {str(e)}")
         # Fournir des recommandations par défaut
-        st.session_state.recommendations = {
-            "points_a_revoir": [],
-            "exercices_recommandes": ["Refaire les exercices du cours"],
-            "ressources": [],
-            "strategies": ["Relire régulièrement", "Pratiquer avec des exercices"],
-            "planning": {
-                "semaine_1": ["Revoir les cours"],
-                "semaine_2": ["Faire des exercices"],
-            },
-        }
+        st.session_state.recommendations = default_recommendations()
+        if fingerprint is not None:
+            st.session_state.recommendations_entry = {
+                "fingerprint": fingerprint,
+                "recommendations": st.session_state.recommendations,
+            }
+
+
+def default_recommendations():
+    """Recommandations génériques, en cas d'échec de la génération"""
+    return {
+        "points_a_revoir": [],
+        "exercices_recommandes": ["Refaire les exercices du cours"],
+        "ressources": [],
+        "strategies": ["Relire régulièrement", "Pratiquer avec des exercices"],
+        "planning": {
+            "semaine_1": ["Revoir les cours"],
+            "semaine_2": ["Faire des exercices"],
+        },
+    }
 
 
 def show_progress_projection():
@@ -189,63 +230,18 @@ def show_progress_projection():
         st.info("Complétez plus de quiz pour voir la projection")
         return
 
-    # Calculer la tendance
-    scores = [r["score"] for r in results]
-
-    # Projection linéaire simple
-    import numpy as np
-
-    x = np.arange(len(scores))
-    z = np.polyfit(x, scores, 1)
-    p = np.poly1d(z)
-
-    # Projeter 5 quiz dans le futur
-    future_x = np.arange(len(scores), len(scores) + 5)
-    future_scores = p(future_x)
-
-    # Graphique
-    fig = go.Figure()
-
-    # Scores réels
-    fig.add_trace(
-        go.Scatter(
-            x=list(range(1, len(scores) + 1)),
-            y=scores,
-            mode="lines+markers",
-            name="Scores Réels",
-            line=dict(color="#1f77b4", width=3),
-        )
-    )
-
-    # Projection
-    fig.add_trace(
-        go.Scatter(
-            x=list(range(len(scores) + 1, len(scores) + 6)),
-            y=future_scores,
-            mode="lines+markers",
-            name="Projection",
-            line=dict(color="#2ecc71", width=2, dash="dash"),
-        )
-    )
-
-    fig.add_hline(
-        y=10, line_dash="dash", line_color="red", annotation_text="Seuil de réussite"
-    )
-
-    fig.update_layout(
-        title="Projection de vos performances",
-        xaxis_title="Numéro du Quiz",
-        yaxis_title="Score (/20)",
-        yaxis_range=[0, 20],
-        height=400,
-    )
+    # Tendance et graphique recalculés seulement après un nouveau quiz
+    snapshot = results_snapshot()
+    future_scores = score_projection(snapshot)
+    window = detail_window(len(results), key="projection_window")
+    fig = projection_figure(snapshot, window)
 
     st.plotly_chart(
         fig, use_container_width=True, key="recommendation_projection_chart"
     )
 
     # Message motivant
-    if future_scores[-1] > scores[-1]:
+    if future_scores[-1] > results[-1]["score"]:
         st.success(
             f"📈 Tendance positive ! En continuant ainsi, vous pourriez atteindre {future_scores[-1]:.1f}/20"
         )
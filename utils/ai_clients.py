@@ -0,0 +1,83 @@
+import asyncio
+import concurrent.futures
+import threading
+import weakref
+from typing import Any, Coroutine, Dict, TypeVar
+import openai
+from config import Config
+
+T = TypeVar("T")
+
+# Endpoints OpenAI-compatibles (None = endpoint OpenAI par défaut)
+PROVIDER_ENDPOINTS = {
+    "deepseek": ("DEEPSEEK_API_KEY", "https://api.deepseek.com"),
+    "groq": ("GROQ_API_KEY", "https://api.groq.com/openai/v1"),
+    "together": ("TOGETHER_API_KEY", "https://api.together.xyz/v1"),
+    "openai": ("OPENAI_API_KEY", None),
+    "xai": ("XAI_API_KEY", "https://api.x.ai/v1"),
+}
+
+_lock = threading.Lock()
+_sync_clients: Dict[str, openai.OpenAI] = {}
+# Les clients async sont liés à leur boucle d'événements
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, openai.AsyncOpenAI]]" = (weakref.WeakKeyDictionary())
+_loop: Any = None
+
+
+def _client_kwargs(provider: str) -> Dict[str, Any]:
+    if provider not in PROVIDER_ENDPOINTS:
+        raise ValueError(f"Provider {provider} non supporté")
+    key_name, base_url = PROVIDER_ENDPOINTS[provider]
+    kwargs: Dict[str, Any] = {"api_key": getattr(Config, key_name)}
+    if base_url:
+        kwargs["base_url"] = base_url
+    return kwargs
+
+
+def get_client(provider: str) -> openai.OpenAI:
+    """Client synchrone partagé par tout le processus (connexions réutilisées)"""
+    with _lock:
+        client = _sync_clients.get(provider)
+        if client is None:
+            client = openai.OpenAI(**_client_kwargs(provider))
+            _sync_clients[provider] = client
+        return client
+
+
+def get_async_client(provider: str) -> openai.AsyncOpenAI:
+    """Client async partagé pour la boucle d'événements courante"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(provider)
+        if client is None:
+            client = openai.AsyncOpenAI(**_client_kwargs(provider))
+            clients[provider] = client
+        return client
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Boucle d'événements de fond, démarrée au premier usage"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="ai-clients-loop", daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def submit_async(coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+    """Planifier une coroutine sur la boucle de fond et retourner un Future
+
+    Toutes les coroutines tournent sur la même boucle, ce qui permet aux
+    clients async de garder leurs connexions ouvertes entre deux reruns.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Exécuter une coroutine depuis du code synchrone (ex: une page Streamlit)"""
+    return submit_async(coro).result()
@@ -1,15 +1,60 @@
-import json
 import streamlit as st
 from config import Config
-from typing import List, Dict, Any, Optional
-import openai
-import re
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+import asyncio
+import math
+import queue
+import threading
+import time
+from utils.ai_clients import get_async_client, get_client, run_async
+from utils.document_processor import DocumentProcessor
+from utils.json_repair import parse_model_json
+from utils.json_stream import JsonArrayStream
+from utils.minhash import LshIndex, answer_key, question_text
+from utils.providers import provider_chain, provider_health
+from utils.response_cache import ResponseCache
+from utils.retrieval import DocumentIndex
+from utils.token_budget import (
+    CHUNK_SUMMARY_OUTPUT_TOKENS,
+    RECOMMENDATIONS_OUTPUT_TOKENS,
+    SUMMARY_CONTEXT_TOKENS,
+    SUMMARY_OUTPUT_TOKENS,
+    TokenBudget,
+)
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache (None when disabled)."""
+    global _response_cache
+    if not Config.RESPONSE_CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                Config.RESPONSE_CACHE_PATH,
+                ttl_seconds=Config.RESPONSE_CACHE_TTL_HOURS * 3600,
+                max_entries=Config.RESPONSE_CACHE_MAX_ENTRIES,
+            )
+        return _response_cache
+
+
+def render_messages(messages: Iterable[Tuple[str, str]]):
+    """Render (level, text) notices collected by AIGenerator.pop_messages."""
+    for level, message in messages:
+        getattr(st, level)(message)
 
 
 class AIGenerator:
     """Class to generate content using different AI providers."""
 
-    def __init__(self):
+    TEMPERATURE = 0.7
+
+    def __init__(self, bypass_cache: bool = False):
+        # bypass_cache: ignore cached responses ("regenerate") but store the new ones
+        self.bypass_cache = bypass_cache
         self.provider = Config.AI_PROVIDER
         # Ensure model is always a string; fallback to openai model if provider key missing
         self.model = Config.MODELS.get(self.provider)
@@ -18,29 +63,37 @@ class AIGenerator:
         if not self.model:
             raise ValueError("No valid model found for AI provider.")
         self.client = self._initialize_client()
+        # Ordered failover chain built from Config.MODELS
+        self.providers = (
+            provider_chain(self.provider)
+            if Config.PROVIDER_FAILOVER
+            else [self.provider]
+        )
+        # Context and max_tokens sizing, valid for every provider of the chain
+        self.budget = TokenBudget(self.providers)
+        # (level, text) notices for the page: generation may run on the async
+        # loop, QuizStream or shard threads, where st.error/st.warning are no-ops
+        self.messages: List[Tuple[str, str]] = []
+        self._messages_lock = threading.Lock()
+
+    def _report(self, level: str, message: str):
+        """Queue an "error" or "warning" notice for the page to render."""
+        with self._messages_lock:
+            self.messages.append((level, message))
+
+    def pop_messages(self) -> List[Tuple[str, str]]:
+        """Return and clear the pending notices (safe from any thread)."""
+        with self._messages_lock:
+            messages, self.messages = self.messages, []
+        return messages
+
+    def show_messages(self):
+        """Render the pending notices; call from the Streamlit script thread."""
+        render_messages(self.pop_messages())
 
     def _initialize_client(self):
-        """Initialize the client depending on the provider."""
-        if self.provider == "deepseek":
-            return openai.OpenAI(
-                api_key=Config.DEEPSEEK_API_KEY, base_url="https://api.deepseek.com"
-            )
-        elif self.provider == "groq":
-            return openai.OpenAI(
-                api_key=Config.GROQ_API_KEY, base_url="https://api.groq.com/openai/v1"
-            )
-        elif self.provider == "together":
-            return openai.OpenAI(
-                api_key=Config.TOGETHER_API_KEY, base_url="https://api.together.xyz/v1"
-            )
-        elif self.provider == "openai":
-            return openai.OpenAI(api_key=Config.OPENAI_API_KEY)
-        elif self.provider == "xai":
-            return openai.OpenAI(
-                api_key=Config.XAI_API_KEY, base_url="https://api.x.ai/v1"
-            )
-        else:
-            raise ValueError(f"Provider {self.provider} non supporté")
+        """Return the shared client for the provider (pooled connections)."""
+        return get_client(self.provider)
 
     def _extract_text(self, response) -> Optional[str]:
         """Try to extract the generated text from various response shapes."""
@@ -97,51 +150,428 @@ class AIGenerator:
 
         return None
 
+    def _model_for(self, provider: str) -> str:
+        return self.model if provider == self.provider else Config.MODELS[provider]
+
+    def _provider_order(self) -> List[str]:
+        return provider_health.order(self.providers)
+
+    def _cache_key(self, prompt: str, max_tokens: int, provider: str) -> str:
+        return ResponseCache.make_key(
+            provider, self._model_for(provider), prompt, max_tokens, self.TEMPERATURE
+        )
+
+    def _get_cached_completion(self, prompt: str, max_tokens: int) -> Optional[str]:
+        cache = get_response_cache()
+        if cache is None or self.bypass_cache:
+            return None
+        # An answer from any provider of the chain is acceptable
+        for provider in self.providers:
+            cached = cache.get(self._cache_key(prompt, max_tokens, provider))
+            if cached is not None:
+                return cached
+        return None
+
+    def _store_completion(self, prompt: str, max_tokens: int, provider: str, text: str):
+        cache = get_response_cache()
+        if cache is not None:
+            cache.put(self._cache_key(prompt, max_tokens, provider), text)
+
+    def _store_if_usable(
+        self,
+        prompt: str,
+        max_tokens: int,
+        provider: str,
+        text: str,
+        extracted: bool,
+        accept: Optional[Callable[[str], bool]],
+    ):
+        """Cache only answers the caller can use.
+
+        A raw dump of an unrecognized response, or text the caller's parser
+        rejects, would otherwise be served again until the entry expires.
+        """
+        if extracted and (accept is None or accept(text)):
+            self._store_completion(prompt, max_tokens, provider, text)
+
+    def _response_text(self, resp) -> Tuple[str, bool]:
+        """Return (text, extracted); as a last resort, dump the response to string."""
+        text = self._extract_text(resp)
+        if text:
+            return text, True
+        return str(resp), False
+
+    def _call_provider(
+        self, provider: str, prompt: str, max_tokens: int
+    ) -> Tuple[str, bool]:
+        """Single synchronous call, recorded in the provider health registry.
+
+        Returns (text, extracted) as _response_text does.
+        """
+        started = time.monotonic()
+        try:
+            resp = get_client(provider).chat.completions.create(
+                model=self._model_for(provider),
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=self.TEMPERATURE,
+                timeout=Config.PROVIDER_TIMEOUT_SECONDS,
+            )
+            result = self._response_text(resp)
+        except Exception:
+            provider_health.record_failure(provider)
+            raise
+        provider_health.record_success(provider, time.monotonic() - started)
+        return result
+
+    async def _acall_provider(
+        self, provider: str, prompt: str, max_tokens: int
+    ) -> Tuple[str, bool]:
+        """Async variant of _call_provider."""
+        started = time.monotonic()
+        try:
+            resp = await get_async_client(provider).chat.completions.create(
+                model=self._model_for(provider),
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=self.TEMPERATURE,
+                timeout=Config.PROVIDER_TIMEOUT_SECONDS,
+            )
+            result = self._response_text(resp)
+        except Exception:
+            provider_health.record_failure(provider)
+            raise
+        provider_health.record_success(provider, time.monotonic() - started)
+        return result
+
     def _generate_completion(
-        self, prompt: str, max_tokens: int = 4096
+        self,
+        prompt: str,
+        max_tokens: int = 4096,
+        accept: Optional[Callable[[str], bool]] = None,
     ) -> Optional[str]:
-        """Generate a completion using the configured provider and return the text."""
-        try:
-            if self.model is None:
-                raise ValueError("Model must not be None when generating completion.")
-            if self.provider == "anthropic":
-                resp = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                )
-            else:  # OpenAI-compatible APIs (DeepSeek, Groq, Together, OpenAI)
-                resp = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                )
+        """Generate a completion, failing over along the provider chain.
+
+        The answer is cached only if `accept(text)` holds (when given).
+        """
+        cached = self._get_cached_completion(prompt, max_tokens)
+        if cached is not None:
+            return cached
+        if Config.HEDGE_REQUESTS and len(self.providers) > 1:
+            return run_async(self._agenerate_completion(prompt, max_tokens, accept))
 
-            text = self._extract_text(resp)
-            if text:
-                return text
-            # As a last resort, try dumping the response to string
-            return str(resp)
+        last_error: Optional[Exception] = None
+        for provider in self._provider_order():
+            try:
+                text, extracted = self._call_provider(provider, prompt, max_tokens)
+            except Exception as e:
+                last_error = e
+                continue
+            self._store_if_usable(prompt, max_tokens, provider, text, extracted, accept)
+            return text
+
+        self._report("error", f"Erreur avec {self.provider}: {last_error}")
+        return f"Erreur: {last_error}"
+
+    async def _agenerate_completion(
+        self,
+        prompt: str,
+        max_tokens: int = 4096,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> Optional[str]:
+        """Async variant of _generate_completion, with optional hedged requests."""
+        cached = self._get_cached_completion(prompt, max_tokens)
+        if cached is not None:
+            return cached
 
+        try:
+            provider, (text, extracted) = await self._ahedged_completion(
+                prompt, max_tokens
+            )
         except Exception as e:
-            st.error(f"Erreur avec {self.provider}: {e}")
+            self._report("error", f"Erreur avec {self.provider}: {e}")
             return f"Erreur: {e}"
+        self._store_if_usable(prompt, max_tokens, provider, text, extracted, accept)
+        return text
+
+    async def _ahedged_completion(self, prompt: str, max_tokens: int):
+        """Return (provider, (text, extracted)) from the first provider to answer.
+
+        The next provider is started when the current one fails or, with
+        HEDGE_REQUESTS, when it is slower than its recent p95 latency.
+        """
+        order = self._provider_order()
+        pending: Dict[asyncio.Future, str] = {}
+        next_idx = 0
+        last_error: Optional[Exception] = None
+
+        def launch():
+            nonlocal next_idx
+            provider = order[next_idx]
+            next_idx += 1
+            task = asyncio.ensure_future(
+                self._acall_provider(provider, prompt, max_tokens)
+            )
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if Config.HEDGE_REQUESTS and next_idx < len(order):
+                    timeout = provider_health.hedge_delay(order[next_idx - 1])
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Hedge: the running request is slower than usual
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        return provider, task.result()
+                    except Exception as e:
+                        last_error = e
+                if not pending and next_idx < len(order):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise last_error or RuntimeError("Aucun provider disponible")
 
     def generate_summary(
         self, text: str, discipline: str, niveau: str, page_count: int = 0
     ) -> Optional[Dict[str, Any]]:
         """Generate an intelligent structured summary with enhanced features."""
+        if self._use_map_reduce(text, discipline, niveau, page_count):
+            return run_async(
+                self._amap_reduce_summary(text, discipline, niveau, page_count)
+            )
+        prompt, max_tokens = self._prepare_summary_request(
+            text, discipline, niveau, page_count
+        )
+        return self._parse_summary(
+            self._generate_completion(prompt, max_tokens, self._is_json_object)
+        )
+
+    async def agenerate_summary(
+        self, text: str, discipline: str, niveau: str, page_count: int = 0
+    ) -> Optional[Dict[str, Any]]:
+        """Async variant of generate_summary."""
+        if self._use_map_reduce(text, discipline, niveau, page_count):
+            return await self._amap_reduce_summary(text, discipline, niveau, page_count)
+        prompt, max_tokens = self._prepare_summary_request(
+            text, discipline, niveau, page_count
+        )
+        return self._parse_summary(
+            await self._agenerate_completion(prompt, max_tokens, self._is_json_object)
+        )
+
+    def _summary_budget(
+        self, discipline: str, niveau: str, page_count: int
+    ) -> Tuple[int, int]:
+        """Return (max_tokens, context_chars) for a summary prompt."""
+        max_tokens = self.budget.output_tokens(SUMMARY_OUTPUT_TOKENS)
+        template = self._build_summary_prompt("", discipline, niveau, page_count, "")
+        context_chars = self.budget.context_chars(
+            template, max_tokens, SUMMARY_CONTEXT_TOKENS
+        )
+        return max_tokens, context_chars
+
+    def _prepare_summary_request(
+        self, text: str, discipline: str, niveau: str, page_count: int
+    ) -> Tuple[str, int]:
+        max_tokens, context_chars = self._summary_budget(discipline, niveau, page_count)
+        if len(text) > context_chars:
+            label = f"Extrait du texte (premiers {context_chars} caractères)"
+        else:
+            label = "Texte intégral"
+        prompt = self._build_summary_prompt(
+            text[:context_chars], discipline, niveau, page_count, label
+        )
+        return prompt, max_tokens
+
+    def _use_map_reduce(
+        self, text: str, discipline: str, niveau: str, page_count: int
+    ) -> bool:
+        if Config.SUMMARY_MODE != "map_reduce":
+            return False
+        _, context_chars = self._summary_budget(discipline, niveau, page_count)
+        return len(text) > context_chars
+
+    def _chunk_budget(self, template: str) -> Tuple[int, int]:
+        """Return (max_tokens, context_chars) for a map or intermediate prompt."""
+        max_tokens = self.budget.output_tokens(CHUNK_SUMMARY_OUTPUT_TOKENS)
+        context_chars = self.budget.context_chars(
+            template, max_tokens, SUMMARY_CONTEXT_TOKENS
+        )
+        return max_tokens, context_chars
+
+    def _summary_chunks(self, text: str, discipline: str) -> List[str]:
+        """Split the whole document into chunks that fit the map prompt.
+
+        Chunks hold SUMMARY_CHUNK_WORDS words, fewer if the model context is
+        too small for them; a longer document gets more chunks, never larger.
+        """
+        _, context_chars = self._chunk_budget(
+            self._build_chunk_summary_prompt("", 1, 1, discipline)
+        )
+        words = text.split()
+        chars_per_word = len(text) / max(1, len(words))
+        chunk_size = max(
+            10, min(Config.SUMMARY_CHUNK_WORDS, int(context_chars / chars_per_word))
+        )
+        return DocumentProcessor.chunk_text(text, chunk_size, chunk_size // 10)
+
+    async def _amap_reduce_summary(
+        self, text: str, discipline: str, niveau: str, page_count: int
+    ) -> Optional[Dict[str, Any]]:
+        """Summarize every chunk, then reduce into the summary JSON.
+
+        At most SUMMARY_MAX_CHUNKS calls run at once. Partial summaries that
+        do not fit the final prompt are first merged by intermediate calls.
+        """
+        semaphore = asyncio.Semaphore(max(1, Config.SUMMARY_MAX_CHUNKS))
+
+        async def complete(prompt: str, max_tokens: int) -> Optional[str]:
+            async with semaphore:
+                response = await self._agenerate_completion(prompt, max_tokens)
+            if response and not response.startswith("Erreur:"):
+                return response
+            return None
+
+        chunks = self._summary_chunks(text, discipline)
+        total = len(chunks)
+        chunk_tokens, _ = self._chunk_budget(
+            self._build_chunk_summary_prompt("", 1, 1, discipline)
+        )
+        partials = await asyncio.gather(
+            *(
+                complete(
+                    self._build_chunk_summary_prompt(chunk, idx + 1, total, discipline),
+                    chunk_tokens,
+                )
+                for idx, chunk in enumerate(chunks)
+            )
+        )
+        # (first part, last part, notes), in document order
+        notes = [
+            (idx + 1, idx + 1, partial)
+            for idx, partial in enumerate(partials)
+            if partial
+        ]
+        if not notes:
+            return self._create_default_summary()
+
+        max_tokens, context_chars = self._summary_budget(discipline, niveau, page_count)
+        notes = await self._areduce_notes(
+            notes, total, discipline, context_chars, complete
+        )
+        prompt = self._build_summary_prompt(
+            self._join_notes(notes, total),
+            discipline,
+            niveau,
+            page_count,
+            "Résumés partiels couvrant tout le document, dans l'ordre",
+        )
+        return self._parse_summary(
+            await self._agenerate_completion(prompt, max_tokens, self._is_json_object)
+        )
+
+    @staticmethod
+    def _join_notes(notes: List[Tuple[int, int, str]], total: int) -> str:
+        return "\n\n".join(
+            (
+                f"[Partie {first}/{total}]\n{text}"
+                if first == last
+                else f"[Parties {first} à {last}/{total}]\n{text}"
+            )
+            for first, last, text in notes
+        )
+
+    async def _areduce_notes(
+        self,
+        notes: List[Tuple[int, int, str]],
+        total: int,
+        discipline: str,
+        context_chars: int,
+        complete: Callable,
+    ) -> List[Tuple[int, int, str]]:
+        """Merge consecutive partial summaries until they fit `context_chars`.
+
+        Each level packs neighbouring notes into groups that fit an
+        intermediate prompt (at least two per group, so every level shrinks
+        the list) and summarizes each group; a failed merge keeps its notes.
+        """
+        merge_tokens, merge_chars = self._chunk_budget(
+            self._build_notes_merge_prompt("", discipline)
+        )
+        while len(notes) > 1 and len(self._join_notes(notes, total)) > context_chars:
+            groups: List[List[Tuple[int, int, str]]] = [[]]
+            for note in notes:
+                group = groups[-1]
+                if len(group) >= 2 and (
+                    len(self._join_notes(group + [note], total)) > merge_chars
+                ):
+                    groups.append([note])
+                else:
+                    group.append(note)
+
+            async def merge(group):
+                if len(group) == 1:
+                    return group[0]
+                merged = await complete(
+                    self._build_notes_merge_prompt(
+                        self._join_notes(group, total), discipline
+                    ),
+                    merge_tokens,
+                )
+                text = merged or "\n\n".join(note[2] for note in group)
+                return group[0][0], group[-1][1], text
+
+            notes = list(await asyncio.gather(*(merge(g) for g in groups)))
+        return notes
+
+    def _build_notes_merge_prompt(self, notes: str, discipline: str) -> str:
+        return f"""En tant qu'expert en {discipline}, fusionne ces résumés partiels 
+consécutifs d'un document de cours en un seul résumé. Conserve les titres de 
+chapitres/sections, les définitions, les théorèmes/formules, les dates importantes 
+et les termes techniques.
 
-        prompt = f"""En tant qu'expert en {discipline} pour le niveau {niveau}, 
+Réponds en texte brut concis (20 lignes maximum), sans JSON.
+
+{notes}
+"""
+
+    def _build_chunk_summary_prompt(
+        self, chunk: str, part: int, total: int, discipline: str
+    ) -> str:
+        return f"""En tant qu'expert en {discipline}, résume la partie {part}/{total} 
+d'un document de cours. Conserve les titres de chapitres/sections, les définitions, 
+les théorèmes/formules, les dates importantes et les termes techniques.
+
+Réponds en texte brut concis (10 à 20 lignes maximum), sans JSON.
+
+{chunk}
+"""
+
+    def _build_summary_prompt(
+        self,
+        text: str,
+        discipline: str,
+        niveau: str,
+        page_count: int,
+        content_label: str,
+    ) -> str:
+        return f"""En tant qu'expert en {discipline} pour le niveau {niveau}, 
 génère un résumé intelligent et structuré du document suivant.
 
 INFORMATIONS DU DOCUMENT :
 - Nombre de pages : {page_count}
-- Extrait du texte (premiers 4000 caractères) :
+- {content_label} :
 
-{text[:4000]}
+{text}
 
 ANALYSE REQUISE :
 1. **Résumé par section/chapitre** (si le document a des chapitres)
@@ -198,22 +628,18 @@ Format JSON requis :
 }}
 """
 
-        response_text = self._generate_completion(prompt)
+    @staticmethod
+    def _is_json_object(response_text: str) -> bool:
+        """Whether a summary or recommendations answer is worth caching."""
+        return isinstance(parse_model_json(response_text).data, dict)
 
+    def _parse_summary(self, response_text: Optional[str]) -> Optional[Dict[str, Any]]:
         if response_text:
-            try:
-                # Extract JSON from the response (in case model added surrounding text)
-                json_start = response_text.find("{")
-                json_end = response_text.rfind("}") + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    return json.loads(json_str)
-                else:
-                    st.error("Format JSON non trouvé dans la réponse")
-                    return self._create_default_summary()
-            except json.JSONDecodeError as e:
-                st.error(f"Erreur de parsing JSON: {e}")
-                return self._create_default_summary()
+            report = self._parse_json(response_text)
+            if isinstance(report.data, dict):
+                # Keep every salvaged section, default the missing ones
+                return {**self._create_default_summary(), **report.data}
+            return self._create_default_summary()
 
         return None
 
@@ -224,14 +650,234 @@ Format JSON requis :
         difficulty: str,
         num_questions: int,
         discipline: str,
+        index: Optional[DocumentIndex] = None,
+        focus: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Generate a quiz based on the document.
+
+        With a DocumentIndex, the prompt context is retrieved from the whole
+        document (optionally targeting `focus`) instead of its beginning.
+        Context size and max_tokens scale with num_questions. Large quizzes
+        are split into QUIZ_SHARD_SIZE shards generated concurrently, each
+        over its own slice of the document.
+        """
+        requests = self._prepare_quiz_requests(
+            text, quiz_type, difficulty, num_questions, discipline, index, focus
+        )
+        if len(requests) > 1:
+            return run_async(self._agenerate_quiz_shards(requests, num_questions))
+        prompt, max_tokens = requests[0]
+        questions = self._parse_quiz(
+            self._generate_completion(prompt, max_tokens, self._has_questions)
+        )
+        return list(self._merge_questions(questions, num_questions))
+
+    async def agenerate_quiz(
+        self,
+        text: str,
+        quiz_type: str,
+        difficulty: str,
+        num_questions: int,
+        discipline: str,
+        index: Optional[DocumentIndex] = None,
+        focus: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Async variant of generate_quiz."""
+        requests = self._prepare_quiz_requests(
+            text, quiz_type, difficulty, num_questions, discipline, index, focus
+        )
+        return await self._agenerate_quiz_shards(requests, num_questions)
+
+    async def _agenerate_quiz_shards(
+        self, requests: List[Tuple[str, int]], num_questions: int
     ) -> List[Dict[str, Any]]:
-        """Generate a quiz based on the document."""
+        responses = await asyncio.gather(
+            *(
+                self._agenerate_completion(prompt, max_tokens, self._has_questions)
+                for prompt, max_tokens in requests
+            )
+        )
+        questions = (q for response in responses for q in self._parse_quiz(response))
+        return list(self._merge_questions(questions, num_questions))
+
+    def stream_quiz(
+        self,
+        text: str,
+        quiz_type: str,
+        difficulty: str,
+        num_questions: int,
+        discipline: str,
+        index: Optional[DocumentIndex] = None,
+        focus: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Streaming variant of generate_quiz yielding each question when complete.
+
+        Shards are streamed concurrently and their questions interleaved in
+        arrival order.
+        """
+        requests = self._prepare_quiz_requests(
+            text, quiz_type, difficulty, num_questions, discipline, index, focus
+        )
+        streams = [
+            self._stream_quiz_request(prompt, max_tokens)
+            for prompt, max_tokens in requests
+        ]
+        questions = streams[0] if len(streams) == 1 else self._interleave(streams)
+        yield from self._merge_questions(questions, num_questions)
+
+    def _stream_quiz_request(
+        self, prompt: str, max_tokens: int
+    ) -> Iterator[Dict[str, Any]]:
+        cached = self._get_cached_completion(prompt, max_tokens)
+        if cached is not None:
+            yield from self._parse_quiz(cached)
+            return
+
+        # Fail over until a provider starts streaming
+        stream = None
+        last_error: Optional[Exception] = None
+        for provider in self._provider_order():
+            try:
+                stream = get_client(provider).chat.completions.create(
+                    model=self._model_for(provider),
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=max_tokens,
+                    temperature=self.TEMPERATURE,
+                    timeout=Config.PROVIDER_TIMEOUT_SECONDS,
+                    stream=True,
+                )
+                break
+            except Exception as e:
+                provider_health.record_failure(provider)
+                last_error = e
+        if stream is None:
+            self._report("error", f"Erreur avec {self.provider}: {last_error}")
+            return
+
+        started = time.monotonic()
+        parser = JsonArrayStream("questions")
+        parts = []
+        yielded = 0
+        try:
+            for event in stream:
+                delta = event.choices[0].delta.content if event.choices else None
+                if not delta:
+                    continue
+                parts.append(delta)
+                for question in parser.feed(delta):
+                    question = self._normalize_question(question)
+                    if question:
+                        yielded += 1
+                        yield question
+        except Exception as e:
+            provider_health.record_failure(provider)
+            self._report("error", f"Erreur avec {provider}: {e}")
+            return
+        provider_health.record_success(provider, time.monotonic() - started)
+
+        response_text = "".join(parts)
+        if parser.count == 0:
+            # Unexpected shape: fall back to parsing the whole response
+            questions = self._parse_quiz(response_text)
+            if questions:
+                self._store_completion(prompt, max_tokens, provider, response_text)
+            yield from questions
+        elif yielded:
+            # Cache only if at least one streamed question could be graded
+            self._store_completion(prompt, max_tokens, provider, response_text)
+
+    def _interleave(self, iterators: List[Iterator[Any]]) -> Iterator[Any]:
+        """Consume several iterators in threads, yielding items as they arrive."""
+        items: "queue.Queue" = queue.Queue()
+        done = object()
+
+        def consume(iterator):
+            try:
+                for item in iterator:
+                    items.put(item)
+            finally:
+                items.put(done)
 
-        prompt = f"""En tant que professeur de {discipline}, crée un quiz de type 
+        for iterator in iterators:
+            threading.Thread(target=consume, args=(iterator,), daemon=True).start()
+
+        remaining = len(iterators)
+        while remaining:
+            item = items.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+
+    def _merge_questions(
+        self, questions: Iterable[Dict[str, Any]], limit: int
+    ) -> Iterator[Dict[str, Any]]:
+        """Drop near-duplicate questions, renumber ids and stop at `limit`."""
+        seen = LshIndex(Config.DEDUP_THRESHOLD, Config.MINHASH_PERMUTATIONS)
+        count = 0
+        for question in questions:
+            if not seen.add_unique(
+                count, question_text(question), answer_key(question)
+            ):
+                continue
+            count += 1
+            question["id"] = count
+            yield question
+            if count >= limit:
+                return
+
+    def _prepare_quiz_requests(
+        self,
+        text: str,
+        quiz_type: str,
+        difficulty: str,
+        num_questions: int,
+        discipline: str,
+        index: Optional[DocumentIndex],
+        focus: Optional[str],
+    ) -> List[Tuple[str, int]]:
+        """Build one (prompt, max_tokens) per shard, sized to its question count."""
+        shard_size = max(
+            1, min(Config.QUIZ_SHARD_SIZE, self.budget.questions_fitting())
+        )
+        shard_count = max(1, math.ceil(num_questions / shard_size))
+        requests = []
+        for shard in range(shard_count):
+            size = num_questions // shard_count + (
+                1 if shard < num_questions % shard_count else 0
+            )
+            max_tokens = self.budget.quiz_output_tokens(size)
+            template = self._build_quiz_prompt(
+                "", quiz_type, difficulty, size, discipline
+            )
+            context_chars = self.budget.context_chars(
+                template, max_tokens, self.budget.quiz_context_tokens(size)
+            )
+            part = (shard, shard_count) if shard_count > 1 else None
+            if index is not None:
+                context = index.select_context(context_chars, query=focus, part=part)
+            else:
+                start = len(text) * shard // shard_count
+                context = text[start : start + context_chars]
+            prompt = self._build_quiz_prompt(
+                context, quiz_type, difficulty, size, discipline
+            )
+            requests.append((prompt, max_tokens))
+        return requests
+
+    def _build_quiz_prompt(
+        self,
+        context: str,
+        quiz_type: str,
+        difficulty: str,
+        num_questions: int,
+        discipline: str,
+    ) -> str:
+        return f"""En tant que professeur de {discipline}, crée un quiz de type 
 "{quiz_type}" avec {num_questions} questions de difficulté "{difficulty}".
 
 Contenu du cours :
-{text[:4000]}
+{context}
 
 Le quiz doit inclure :
 - Des questions pertinentes et académiques
@@ -256,44 +902,121 @@ Format JSON requis :
 }}
 
 Types de compétences : Compréhension, Application, Analyse, Mémorisation
+Pour une question ouverte ("type": "ouverte", sans "options"), ajoute
+"key_phrases" : les expressions clés attendues dans la réponse.
 """
 
-        response_text = self._generate_completion(prompt)
+    def _has_questions(self, response_text: str) -> bool:
+        """Whether a quiz answer holds at least one gradable question."""
+        data = parse_model_json(response_text, list_key="questions").data
+        questions = data.get("questions") if isinstance(data, dict) else None
+        return any(map(self._normalize_question, questions or []))
 
+    def _parse_quiz(self, response_text: Optional[str]) -> List[Dict[str, Any]]:
         if response_text:
-            try:
-                json_start = response_text.find("{")
-                json_end = response_text.rfind("}") + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    quiz_data = json.loads(json_str)
-                    return quiz_data.get("questions", [])
-                else:
-                    st.error("Format JSON non trouvé dans la réponse")
-                    return []
-            except json.JSONDecodeError as e:
-                st.error(f"Erreur de parsing JSON: {e}")
-                return []
+            report = self._parse_json(response_text, list_key="questions")
+            if isinstance(report.data, dict):
+                raw_questions = report.data.get("questions") or []
+                questions = [
+                    q for q in map(self._normalize_question, raw_questions) if q
+                ]
+                if len(questions) < len(raw_questions):
+                    self._report(
+                        "warning",
+                        f"{len(raw_questions) - len(questions)} question(s) "
+                        "incomplète(s) ignorée(s)",
+                    )
+                return questions
 
         return []
 
+    def _normalize_question(self, question: Any) -> Optional[Dict[str, Any]]:
+        """Return a usable question dict, or None if it cannot be graded."""
+        if not isinstance(question, dict):
+            return None
+        if not question.get("question") or "correct_answer" not in question:
+            return None
+        options = question.get("options")
+        question.setdefault("type", "qcm" if options else "ouverte")
+        if question["type"] == "qcm":
+            if not isinstance(options, list):
+                return None
+            # A QCM whose answer is not among its options can never be passed
+            answer = str(question["correct_answer"]).strip()
+            if answer not in {str(option).strip() for option in options}:
+                return None
+        return question
+
+    def _parse_json(self, response_text: str, list_key: Optional[str] = None):
+        """Tolerant JSON extraction, surfacing what had to be repaired or dropped."""
+        report = parse_model_json(response_text, list_key=list_key)
+        if not report.ok:
+            self._report(
+                "error", f"Format JSON non exploitable : {', '.join(report.dropped)}"
+            )
+        elif report.dropped:
+            self._report(
+                "warning",
+                f"Réponse partiellement récupérée : {', '.join(report.dropped)}",
+            )
+        return report
+
     def generate_recommendations(
-        self, quiz_results: List[Dict[str, Any]], weak_areas: List[str]
+        self,
+        quiz_results: List[Dict[str, Any]],
+        weak_areas: List[str],
+        average_score: Optional[float] = None,
     ) -> Optional[Dict[str, Any]]:
-        """Generate personalized recommendations based on quiz results."""
+        """Generate personalized recommendations based on quiz results.
 
-        # Summarize results
-        summary = {
-            "total_quizzes": len(quiz_results),
-            "avg_score": (
+        Returns None when the provider fails or the answer cannot be parsed,
+        so that a generic fallback is never mistaken for a real answer.
+        Pass `average_score` when it is already known (running statistics)
+        to avoid a scan of the whole history.
+        """
+        prompt = self._build_recommendations_prompt(
+            quiz_results, weak_areas, average_score
+        )
+        max_tokens = self.budget.output_tokens(RECOMMENDATIONS_OUTPUT_TOKENS)
+        return self._parse_recommendations(
+            self._generate_completion(prompt, max_tokens, self._is_json_object)
+        )
+
+    async def agenerate_recommendations(
+        self,
+        quiz_results: List[Dict[str, Any]],
+        weak_areas: List[str],
+        average_score: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Async variant of generate_recommendations."""
+        prompt = self._build_recommendations_prompt(
+            quiz_results, weak_areas, average_score
+        )
+        max_tokens = self.budget.output_tokens(RECOMMENDATIONS_OUTPUT_TOKENS)
+        return self._parse_recommendations(
+            await self._agenerate_completion(prompt, max_tokens, self._is_json_object)
+        )
+
+    def _build_recommendations_prompt(
+        self,
+        quiz_results: List[Dict[str, Any]],
+        weak_areas: List[str],
+        average_score: Optional[float] = None,
+    ) -> str:
+        if average_score is None:
+            average_score = (
                 sum(r.get("score", 0) for r in quiz_results) / len(quiz_results)
                 if quiz_results
                 else 0
-            ),
+            )
+        # Summarize results
+        summary = {
+            "total_quizzes": len(quiz_results),
+            "avg_score": average_score,
             "weak_areas": weak_areas[:5],
         }
 
-        prompt = f"""En tant que conseiller pédagogique, analyse les résultats 
+        return f"""En tant que conseiller pédagogique, analyse les résultats 
 de l'étudiant et propose des recommandations personnalisées.
 
 Résumé des résultats : 
@@ -326,24 +1049,16 @@ Format JSON requis :
 }}
 """
 
-        response_text = self._generate_completion(prompt)
-
+    def _parse_recommendations(
+        self, response_text: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
         if response_text:
-            try:
-                json_start = response_text.find("{")
-                json_end = response_text.rfind("}") + 1
-                if json_start != -1 and json_end > json_start:
-                    json_str = response_text[json_start:json_end]
-                    return json.loads(json_str)
-                else:
-                    st.error("Format JSON non trouvé dans la réponse")
-                    return self._create_default_recommendations()
-            except json.JSONDecodeError as e:
-                st.error(f"Erreur de parsing JSON: {e}")
-                return self._create_default_recommendations()
-
-        # Si pas de réponse, retourner les recommandations par défaut
-        return self._create_default_recommendations()
+            report = self._parse_json(response_text)
+            if isinstance(report.data, dict):
+                return {**self._create_default_recommendations(), **report.data}
+
+        # No usable answer: let the caller fall back without storing anything
+        return None
 
     def _create_default_summary(self) -> Dict[str, Any]:
         """Create a default summary when generation fails."""
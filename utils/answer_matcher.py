@@ -0,0 +1,181 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+_KEYWORD_RE = re.compile(r"\b\w{4,}\b")
+_WORD_RE = re.compile(r"\w+")
+
+# Suffixes retirés par le raciniseur léger (du plus long au plus court)
+_FRENCH_SUFFIXES = (
+    "issements",
+    "issement",
+    "atrices",
+    "atrice",
+    "ateurs",
+    "ations",
+    "ateur",
+    "ation",
+    "ements",
+    "ement",
+    "ments",
+    "ment",
+    "euses",
+    "euse",
+    "ités",
+    "ites",
+    "ité",
+    "ite",
+    "ives",
+    "ive",
+    "ifs",
+    "eux",
+    "if",
+    "es",
+    "s",
+    "x",
+    "e",
+)
+_MIN_STEM = 3
+
+
+def fold_accents(text: str) -> str:
+    """Retirer les accents (é -> e, ç -> c)"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    """Raciniseur léger du français (pluriels et suffixes courants)"""
+    for suffix in _FRENCH_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+class AhoCorasick:
+    """Automate d'Aho-Corasick sur des séquences de mots
+
+    Trouve en un seul passage toutes les expressions (suites de mots)
+    présentes dans un texte découpé en mots.
+    """
+
+    def __init__(self, phrases: Iterable[Sequence[str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+        self.phrases: List[Tuple[str, ...]] = []
+        for phrase in phrases:
+            self._insert(tuple(phrase))
+        self._build()
+
+    def _insert(self, phrase: Tuple[str, ...]):
+        if not phrase:
+            return
+        node = 0
+        for word in phrase:
+            if word not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+                self._goto[node][word] = len(self._goto) - 1
+            node = self._goto[node][word]
+        self._output[node].add(len(self.phrases))
+        self.phrases.append(phrase)
+
+    def _build(self):
+        # Parcours en largeur : liens d'échec et sorties héritées
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    def find(self, words: Iterable[str]) -> Set[int]:
+        """Indices des expressions présentes dans la suite de mots"""
+        found: Set[int] = set()
+        node = 0
+        for word in words:
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+            found |= self._output[node]
+        return found
+
+
+class OpenAnswerMatcher:
+    """Correcteur compilé d'une question ouverte
+
+    Les mots-clés (4 lettres et plus) de la réponse attendue et les
+    expressions clés éventuelles sont préparés une fois ; une réponse est
+    juste si elle en contient au moins `threshold`.
+    """
+
+    def __init__(
+        self,
+        correct_answer: str,
+        key_phrases: Sequence[str] = (),
+        fold: bool = False,
+        stemming: bool = False,
+        threshold: float = 0.6,
+    ):
+        self.fold = fold
+        self.stemming = stemming
+        self.threshold = threshold
+        self.keywords = set(self._keywords(correct_answer))
+        phrases = [self._words(p) for p in key_phrases]
+        self.automaton = AhoCorasick(p for p in phrases if p) if any(phrases) else None
+        self.targets = len(self.keywords) + (
+            len(self.automaton.phrases) if self.automaton else 0
+        )
+
+    def _normalize(self, text: str) -> str:
+        text = text.lower().strip()
+        return fold_accents(text) if self.fold else text
+
+    def _keywords(self, text: str) -> List[str]:
+        words = _KEYWORD_RE.findall(self._normalize(text))
+        return [stem(w) for w in words] if self.stemming else words
+
+    def _words(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(self._normalize(text))
+        return [stem(w) for w in words] if self.stemming else words
+
+    def score(self, user_answer: str) -> float:
+        """Part des mots-clés et expressions clés présents dans la réponse"""
+        if not self.targets:
+            return 0.0
+        matched = len(self.keywords.intersection(self._keywords(user_answer)))
+        if self.automaton is not None:
+            matched += len(self.automaton.find(self._words(user_answer)))
+        return matched / self.targets
+
+    def matches(self, user_answer: str) -> bool:
+        return self.targets > 0 and self.score(user_answer) >= self.threshold
+
+
+@lru_cache(maxsize=4096)
+def compile_matcher(
+    correct_answer: str,
+    key_phrases: Tuple[str, ...] = (),
+    fold: bool = False,
+    stemming: bool = False,
+) -> OpenAnswerMatcher:
+    """Correcteur mis en cache par réponse attendue et options"""
+    return OpenAnswerMatcher(correct_answer, key_phrases, fold=fold, stemming=stemming)
+
+
+def matcher_for(
+    correct_answer: str,
+    key_phrases: Optional[Iterable[str]] = None,
+    fold: bool = False,
+    stemming: bool = False,
+) -> OpenAnswerMatcher:
+    if isinstance(key_phrases, str):
+        key_phrases = [key_phrases]
+    phrases = tuple(str(p) for p in key_phrases or ())
+    return compile_matcher(str(correct_answer), phrases, fold=fold, stemming=stemming)
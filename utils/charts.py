@@ -0,0 +1,87 @@
+from typing import Optional, Sequence, Tuple
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+from config import Config
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], target: int) -> np.ndarray:
+    """Indices des points gardés par Largest-Triangle-Three-Buckets
+
+    Le premier et le dernier point sont conservés ; entre les deux, chaque
+    tranche garde le point qui forme le plus grand triangle avec le point
+    précédemment retenu et la moyenne de la tranche suivante, ce qui
+    préserve les pics et les creux de la série.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if target >= n or target < 3:
+        return np.arange(n)
+
+    # target - 2 tranches pour les points intérieurs [1, n - 1)
+    edges = np.linspace(1, n - 1, target - 1).astype(np.int64)
+    selected = np.empty(target, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(target - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def series_trace(
+    x: Sequence[float],
+    y: Sequence[float],
+    max_points: Optional[int] = None,
+    webgl_threshold: Optional[int] = None,
+    **kwargs,
+) -> go.Scatter:
+    """Trace d'une série longue : sous-échantillonnée, en WebGL si besoin
+
+    Au-delà de `max_points`, la série est réduite par LTTB (sans marqueurs,
+    illisibles à cette densité) ; au-delà de `webgl_threshold` points, la
+    trace est rendue en WebGL (Scattergl) plutôt qu'en SVG.
+    """
+    max_points = max_points or Config.CHART_MAX_POINTS
+    webgl_threshold = webgl_threshold or Config.CHART_WEBGL_THRESHOLD
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+
+    if n > max_points:
+        keep = lttb_indices(x, y, max_points)
+        x, y = x[keep], y[keep]
+        kwargs["mode"] = "lines"
+    trace = go.Scattergl if n > webgl_threshold else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+def detail_window(count: int, key: str) -> Optional[Tuple[int, int]]:
+    """Plage de quiz à détailler (numéros inclus), pour les longues séries
+
+    Sous `CHART_MAX_POINTS` tous les points sont déjà affichés : pas de
+    curseur. Au-delà, la plage choisie est ré-échantillonnée à pleine
+    densité, ce qui fait réapparaître le détail en « zoomant ».
+    """
+    if count <= Config.CHART_MAX_POINTS:
+        return None
+    start, end = st.slider(
+        "Plage de quiz affichée",
+        min_value=1,
+        max_value=count,
+        value=(1, count),
+        key=key,
+    )
+    if (start, end) == (1, count):
+        return None
+    return start, end
@@ -0,0 +1,207 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import streamlit as st
+from config import Config
+from utils.quiz_stats import WEAK_COMPETENCE_THRESHOLD
+
+_DAY = 86400.0
+
+
+def _timestamp(result: Dict) -> float:
+    """Date de fin du quiz en secondes (NaN si absente ou illisible)"""
+    try:
+        return datetime.fromisoformat(result["end_time"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return np.nan
+
+
+class CompetenceMatrix:
+    """Scores par compétence de tous les résultats, en matrice NumPy
+
+    Une ligne par résultat, une colonne par compétence (NaN si le quiz ne
+    l'évaluait pas). La maîtrise est une moyenne pondérée par une
+    décroissance exponentielle de l'âge du résultat, mesuré depuis le
+    dernier quiz : les indicateurs ne changent que si un résultat est ajouté.
+    """
+
+    def __init__(
+        self, results: Iterable[Dict] = (), half_life_days: Optional[float] = None
+    ):
+        self.half_life_days = half_life_days or Config.COMPETENCE_HALF_LIFE_DAYS
+        self.competences: List[str] = []
+        self._columns: Dict[str, int] = {}
+        # Scores (0 si absent), présence (1/0) et carrés des scores
+        self._values = np.zeros((64, 8))
+        self._present = np.zeros((64, 8))
+        self._squares = np.zeros((64, 8))
+        self._times = np.full(64, np.nan)
+        self._summary: Optional[Dict[str, np.ndarray]] = None
+        self.count = 0
+        self.last: Optional[Dict] = None
+        for result in results:
+            self.add(result)
+
+    @property
+    def scores(self) -> np.ndarray:
+        """Matrice (résultats x compétences) des pourcentages, NaN si absent"""
+        rows, columns = self.count, len(self.competences)
+        present = self._present[:rows, :columns].astype(bool)
+        return np.where(present, self._values[:rows, :columns], np.nan)
+
+    @property
+    def times(self) -> np.ndarray:
+        return self._times[: self.count]
+
+    def _reserve(self, rows: int, columns: int):
+        """Agrandir les tableaux par doublement (ajouts en O(1) amorti)"""
+        capacity_rows, capacity_columns = self._values.shape
+        if rows <= capacity_rows and columns <= capacity_columns:
+            return
+        new_rows = capacity_rows
+        while new_rows < rows:
+            new_rows *= 2
+        new_columns = capacity_columns
+        while new_columns < columns:
+            new_columns *= 2
+        for name in ("_values", "_present", "_squares"):
+            grown = np.zeros((new_rows, new_columns))
+            grown[:capacity_rows, :capacity_columns] = getattr(self, name)
+            setattr(self, name, grown)
+        times = np.full(new_rows, np.nan)
+        times[:capacity_rows] = self._times
+        self._times = times
+
+    def add(self, result: Dict):
+        breakdown = result.get("competence_breakdown") or {}
+        for comp in breakdown:
+            if comp not in self._columns:
+                self._columns[comp] = len(self.competences)
+                self.competences.append(comp)
+        self._reserve(self.count + 1, len(self.competences))
+        row = self.count
+        for comp, value in breakdown.items():
+            column = self._columns[comp]
+            self._values[row, column] = value
+            self._present[row, column] = 1.0
+            self._squares[row, column] = value * value
+        self._times[row] = _timestamp(result)
+        self.count += 1
+        self.last = result
+        self._summary = None
+
+    def _ages(self) -> np.ndarray:
+        """Âge de chaque résultat en jours par rapport au plus récent"""
+        times = self.times
+        if not np.isfinite(times).any():
+            return np.zeros(self.count)
+        ages = (np.nanmax(times) - times) / _DAY
+        # Sans date, un résultat compte comme récent
+        return np.nan_to_num(ages, nan=0.0)
+
+    def _compute(self) -> Dict[str, np.ndarray]:
+        """Tous les indicateurs en quelques produits matrice-vecteur
+
+        Calculés une fois par état de la matrice (remis à zéro par `add`).
+        """
+        if self._summary is not None:
+            return self._summary
+        rows, columns = self.count, len(self.competences)
+        # Lignes entières (contiguës) : les produits sont plus rapides que sur
+        # des colonnes découpées, le résultat est tronqué ensuite
+        values = self._values[:rows]
+        present = self._present[:rows]
+        squares = self._squares[:rows]
+        ages = self._ages()
+        decay = 0.5 ** (ages / self.half_life_days)
+        weeks = -ages / 7
+
+        def project(weights: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+            return (weights @ matrix)[:columns]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Moyenne pondérée par l'ancienneté et son intervalle de confiance :
+            # écart type pondéré / racine de l'effectif effectif (Σw)² / Σw²
+            total = project(decay, present)
+            mastery = project(decay, values) / total
+            variance = np.maximum(project(decay, squares) / total - mastery**2, 0)
+            effective = total**2 / project(decay * decay, present)
+            half = 1.96 * np.sqrt(variance / effective)
+
+            # Régression linéaire des scores en fonction de la date
+            ones = np.ones(rows)
+            n = project(ones, present)
+            sx, sxx = project(weeks, present), project(weeks * weeks, present)
+            sy, sxy = project(ones, values), project(weeks, values)
+            denominator = n * sxx - sx * sx
+            slope = (n * sxy - sx * sy) / denominator
+
+        self._summary = {
+            "mastery": mastery,
+            "low": np.clip(mastery - half, 0, 100),
+            "high": np.clip(mastery + half, 0, 100),
+            "trend": np.where(np.abs(denominator) > 1e-9, slope, 0.0),
+            "count": n,
+        }
+        return self._summary
+
+    def mastery(self) -> np.ndarray:
+        """Maîtrise pondérée par l'ancienneté, par compétence (en %)"""
+        return self._compute()["mastery"]
+
+    def confidence_intervals(self) -> np.ndarray:
+        """Intervalle de confiance à 95 % (bas, haut) de la maîtrise"""
+        summary = self._compute()
+        return np.stack([summary["low"], summary["high"]], axis=1)
+
+    def trends(self) -> np.ndarray:
+        """Pente des scores par compétence, en points de % par semaine
+
+        0 si la compétence n'a été évaluée qu'à une seule date.
+        """
+        return self._compute()["trend"]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Indicateurs par compétence (ordre de première apparition)"""
+        indicators = self._compute()
+        return {
+            comp: {
+                "mastery": float(indicators["mastery"][i]),
+                "low": float(indicators["low"][i]),
+                "high": float(indicators["high"][i]),
+                "trend": float(indicators["trend"][i]),
+                "count": int(indicators["count"][i]),
+            }
+            for i, comp in enumerate(self.competences)
+        }
+
+    def mastery_by_competence(self) -> Dict[str, float]:
+        return dict(zip(self.competences, self.mastery().tolist()))
+
+    def weak_areas(
+        self, threshold: float = WEAK_COMPETENCE_THRESHOLD, limit: int = 5
+    ) -> List[str]:
+        """Compétences sous le seuil de maîtrise, de la plus faible à la moins faible"""
+        mastery = self.mastery()
+        order = np.argsort(mastery, kind="stable")
+        return [self.competences[i] for i in order[:limit] if mastery[i] < threshold]
+
+
+def session_competences() -> CompetenceMatrix:
+    """Matrice des compétences de la session, tenue à jour
+
+    Comme `session_statistics` : seuls les nouveaux résultats sont ajoutés,
+    la matrice n'est reconstruite que si l'historique a été remplacé.
+    """
+    results = st.session_state.get("quiz_results", [])
+    matrix = st.session_state.get("competence_matrix")
+    if (
+        matrix is None
+        or matrix.count > len(results)
+        or (matrix.count and results[matrix.count - 1] is not matrix.last)
+    ):
+        matrix = CompetenceMatrix()
+    for result in results[matrix.count :]:
+        matrix.add(result)
+    st.session_state.competence_matrix = matrix
+    return matrix
@@ -1,7 +1,48 @@
 import json
 import os
-from datetime import datetime
-from typing import Dict, List
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from config import Config
+from utils.result_log import get_result_log
+
+# Utilisateur des données d'avant le multi-utilisateur (fichiers de DATA_DIR)
+DEFAULT_USER_ID = "default"
+_USER_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def valid_user_id(user_id: Optional[str]) -> bool:
+    """Identifiant utilisable comme nom de dossier (il vient de l'URL)"""
+    return bool(user_id) and _USER_ID_RE.fullmatch(user_id) is not None
+
+
+def user_data_dir(user_id: str) -> str:
+    """Dossier des fichiers JSON d'un utilisateur
+
+    L'utilisateur par défaut garde les fichiers historiques de DATA_DIR ;
+    les autres ont chacun leur sous-dossier.
+    """
+    if not valid_user_id(user_id):
+        raise ValueError(f"Identifiant utilisateur invalide : {user_id!r}")
+    if user_id == DEFAULT_USER_ID:
+        return Config.DATA_DIR
+    return os.path.join(Config.DATA_DIR, "users", user_id)
+
+
+def _end_bound(end: str) -> Tuple[str, bool]:
+    """Borne haute de end_time : (valeur, exclusive)
+
+    Une date seule ("2026-01-31") inclut toute la journée : elle devient le
+    début du jour suivant, exclu. Une date-heure reste une borne incluse.
+    """
+    try:
+        day = date.fromisoformat(end)
+    except ValueError:
+        return end, False
+    return (day + timedelta(days=1)).isoformat(), True
 
 
 class Database:
@@ -9,10 +50,17 @@ class Database:
 
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
-        os.makedirs(data_dir, exist_ok=True)
+        self.results_log = get_result_log(
+            data_dir, compact_every=Config.RESULT_LOG_COMPACT_EVERY
+        )
+
+    def _ensure_dir(self):
+        """Créer le dossier à la première écriture (pas pour une simple visite)"""
+        os.makedirs(self.data_dir, exist_ok=True)
 
     def save_user_profile(self, profile_data: Dict):
         """Sauvegarder le profil utilisateur"""
+        self._ensure_dir()
         filepath = os.path.join(self.data_dir, "profile.json")
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(profile_data, f, indent=2, ensure_ascii=False)
@@ -27,33 +75,519 @@ class Database:
 
     def save_documents(self, documents: List[Dict]):
         """Sauvegarder les documents"""
+        self._ensure_dir()
         filepath = os.path.join(self.data_dir, "documents.json")
-        # Ne pas sauvegarder le texte complet (trop volumineux)
+        # Ne pas sauvegarder le texte complet (trop volumineux) ni l'index
         docs_light = [
-            {k: v for k, v in doc.items() if k != "text"} for doc in documents
+            {k: v for k, v in doc.items() if k not in ("text", "index")}
+            for doc in documents
         ]
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(docs_light, f, indent=2, ensure_ascii=False)
 
-    def save_quiz_results(self, results: List[Dict]):
-        """Sauvegarder les résultats de quiz"""
-        filepath = os.path.join(self.data_dir, "quiz_results.json")
+    def load_documents(self) -> List[Dict]:
+        """Charger les documents (sans leur texte)"""
+        filepath = os.path.join(self.data_dir, "documents.json")
+        if os.path.exists(filepath):
+            with open(filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return []
+
+    def save_recommendations(self, entry: Dict):
+        """Sauvegarder les dernières recommandations et leur empreinte"""
+        self._ensure_dir()
+        filepath = os.path.join(self.data_dir, "recommendations.json")
         with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+            json.dump(entry, f, indent=2, ensure_ascii=False)
 
-    def load_quiz_results(self) -> List[Dict]:
-        """Charger les résultats de quiz"""
-        filepath = os.path.join(self.data_dir, "quiz_results.json")
+    def load_recommendations(self) -> Dict:
+        """Charger les dernières recommandations (vide si aucune)"""
+        filepath = os.path.join(self.data_dir, "recommendations.json")
         if os.path.exists(filepath):
             with open(filepath, "r", encoding="utf-8") as f:
                 return json.load(f)
-        return []
+        return {}
+
+    def save_quiz_results(self, results: List[Dict]):
+        """Sauvegarder les résultats de quiz
+
+        Si `results` prolonge l'historique enregistré (même dernier résultat
+        enregistré), seuls les nouveaux résultats sont ajoutés au journal ;
+        sinon tout l'historique est réécrit.
+        """
+        self._ensure_dir()
+        stored = self.results_log.count()
+        if len(results) >= stored and self._extends_log(results, stored):
+            for result in results[stored:]:
+                self.results_log.append(result)
+        else:
+            self.results_log.rewrite(results)
+
+    def _extends_log(self, results: List[Dict], stored: int) -> bool:
+        if stored == 0:
+            return True
+        tail = self.results_log.tail(1)
+        # Comparaison sur le JSON : le résultat relu a fait l'aller-retour
+        return bool(tail) and json.dumps(
+            results[stored - 1], ensure_ascii=False
+        ) == json.dumps(tail[0], ensure_ascii=False)
+
+    def add_quiz_result(self, result: Dict):
+        """Ajouter un résultat sans réécrire l'historique"""
+        self._ensure_dir()
+        self.results_log.append(result)
+
+    def add_quiz_results(self, results: List[Dict]):
+        """Ajouter plusieurs résultats"""
+        self._ensure_dir()
+        for result in results:
+            self.results_log.append(result)
+
+    def load_quiz_results(self) -> List[Dict]:
+        """Charger les résultats de quiz"""
+        return self.results_log.read_all()
+
+    def load_recent_quiz_results(self, k: int) -> List[Dict]:
+        """Charger les k derniers résultats de quiz"""
+        return self.results_log.tail(k)
+
+    def iter_quiz_results(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        document: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """Parcourir les résultats filtrés sans les charger tous en mémoire
+
+        `start`/`end` bornent end_time (ISO, inclus ; une date seule en `end`
+        couvre toute la journée) ; `user_ids` est sans effet sur ce stockage
+        mono-utilisateur.
+        """
+        bound, exclusive = _end_bound(end) if end else (None, False)
+        for result in self.results_log.iter_all():
+            end_time = result.get("end_time") or ""
+            if start and end_time < start:
+                continue
+            if bound and (end_time >= bound if exclusive else end_time > bound):
+                continue
+            if document and result.get("document") != document:
+                continue
+            yield result
+
+    def export_to_parquet(
+        self,
+        filename: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        document: Optional[str] = None,
+        batch_size: int = 10000,
+    ) -> str:
+        """Exporter les résultats en Parquet, par groupes de lignes
+
+        Chaque compétence de competence_breakdown devient une colonne
+        `competence_<nom>`. Les résultats sont lus deux fois en flux (noms
+        des compétences, puis écriture) sans matérialiser l'historique.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        filters = dict(start=start, end=end, user_ids=user_ids, document=document)
+        competences = sorted(
+            {
+                name
+                for result in self.iter_quiz_results(**filters)
+                for name in (result.get("competence_breakdown") or {})
+            }
+        )
+        schema = pa.schema(
+            [
+                ("user_id", pa.string()),
+                ("quiz_id", pa.string()),
+                ("document", pa.string()),
+                ("end_time", pa.timestamp("us")),
+                ("duration", pa.int64()),
+                ("score", pa.float64()),
+                ("percentage", pa.float64()),
+                ("earned_points", pa.float64()),
+                ("total_points", pa.float64()),
+                ("correct_answers", pa.int64()),
+                ("total_questions", pa.int64()),
+                ("weak_areas", pa.list_(pa.string())),
+            ]
+            + [(f"competence_{name}", pa.float64()) for name in competences]
+        )
+
+        self._ensure_dir()
+        filepath = os.path.join(self.data_dir, filename)
+        with pq.ParquetWriter(filepath, schema) as writer:
+            batch = []
+            for result in self.iter_quiz_results(**filters):
+                batch.append(_flatten_result(result, competences))
+                if len(batch) >= batch_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if batch:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        return filepath
 
     def export_to_csv(self, results: List[Dict], filename: str):
         """Exporter les résultats en CSV"""
         import pandas as pd
 
         df = pd.DataFrame(results)
+        self._ensure_dir()
         filepath = os.path.join(self.data_dir, filename)
         df.to_csv(filepath, index=False, encoding="utf-8")
         return filepath
+
+
+def _flatten_result(result: Dict, competences: List[str]) -> Dict[str, Any]:
+    """Ligne d'export : champs typés et une colonne par compétence"""
+    end_time = result.get("end_time")
+    breakdown = result.get("competence_breakdown") or {}
+    row = {
+        "user_id": result.get("user_id"),
+        "quiz_id": result.get("quiz_id"),
+        "document": result.get("document"),
+        "end_time": datetime.fromisoformat(end_time) if end_time else None,
+        "weak_areas": result.get("weak_areas") or [],
+    }
+    for key in ("score", "percentage", "earned_points", "total_points"):
+        value = result.get(key)
+        row[key] = float(value) if value is not None else None
+    for key in ("duration", "correct_answers", "total_questions"):
+        value = result.get(key)
+        row[key] = int(value) if value is not None else None
+    for name in competences:
+        value = breakdown.get(name)
+        row[f"competence_{name}"] = float(value) if value is not None else None
+    return row
+
+
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_connections_lock = threading.Lock()
+
+
+def _shared_connection(path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """Connexion (et verrou) unique par fichier SQLite
+
+    Une instance de SQLiteDatabase est créée par utilisateur : leur donner
+    chacune une connexion épuiserait les descripteurs de fichiers.
+    """
+    key = os.path.abspath(path)
+    with _connections_lock:
+        if key not in _connections:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            conn = sqlite3.connect(key, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                conn.execute("""CREATE TABLE IF NOT EXISTS profiles (
+                        user_id TEXT PRIMARY KEY,
+                        data TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS documents (
+                        id INTEGER PRIMARY KEY,
+                        user_id TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        data TEXT NOT NULL
+                    )""")
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_documents_user "
+                    "ON documents (user_id)"
+                )
+                conn.execute("""CREATE TABLE IF NOT EXISTS quiz_results (
+                        id INTEGER PRIMARY KEY,
+                        user_id TEXT NOT NULL,
+                        quiz_id TEXT,
+                        end_time TEXT,
+                        score REAL,
+                        percentage REAL,
+                        data TEXT NOT NULL
+                    )""")
+                for column in ("user_id", "quiz_id", "end_time"):
+                    conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_quiz_results_{column} "
+                        f"ON quiz_results ({column})"
+                    )
+                conn.execute("""CREATE TABLE IF NOT EXISTS recommendations (
+                        user_id TEXT PRIMARY KEY,
+                        data TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )""")
+                conn.execute("""CREATE TABLE IF NOT EXISTS meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL
+                    )""")
+            _connections[key] = (conn, threading.Lock())
+        return _connections[key]
+
+
+class SQLiteDatabase(Database):
+    """Base de données SQLite (mode WAL), même interface que Database
+
+    Profils, documents et résultats de quiz sont stockés dans des tables
+    indexées (par utilisateur, quiz_id et end_time) ; chaque écriture est
+    une transaction. Plusieurs utilisateurs partagent le même fichier.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "data",
+        filename: str = "quizai.sqlite",
+        user_id: str = "default",
+    ):
+        # Pas d'appel à Database.__init__ : le journal JSON est inutile ici
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, filename)
+        self.user_id = user_id
+        # Connexion partagée par tous les utilisateurs du fichier
+        self._conn, self._lock = _shared_connection(self.path)
+
+    def save_user_profile(self, profile_data: Dict):
+        """Sauvegarder le profil utilisateur"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (user_id, data, updated_at) "
+                "VALUES (?, ?, ?)",
+                (
+                    self.user_id,
+                    json.dumps(profile_data, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+
+    def load_user_profile(self) -> Dict:
+        """Charger le profil utilisateur"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM profiles WHERE user_id = ?", (self.user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save_documents(self, documents: List[Dict]):
+        """Sauvegarder les documents (remplace ceux de l'utilisateur)"""
+        rows = [
+            (
+                self.user_id,
+                doc.get("name", ""),
+                json.dumps(
+                    {k: v for k, v in doc.items() if k not in ("text", "index")},
+                    ensure_ascii=False,
+                ),
+            )
+            for doc in documents
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM documents WHERE user_id = ?", (self.user_id,)
+            )
+            self._conn.executemany(
+                "INSERT INTO documents (user_id, name, data) VALUES (?, ?, ?)", rows
+            )
+
+    def load_documents(self) -> List[Dict]:
+        """Charger les documents (sans leur texte)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM documents WHERE user_id = ? ORDER BY id",
+                (self.user_id,),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def save_recommendations(self, entry: Dict):
+        """Sauvegarder les dernières recommandations et leur empreinte"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recommendations (user_id, data, updated_at) "
+                "VALUES (?, ?, ?)",
+                (self.user_id, json.dumps(entry, ensure_ascii=False), time.time()),
+            )
+
+    def load_recommendations(self) -> Dict:
+        """Charger les dernières recommandations (vide si aucune)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM recommendations WHERE user_id = ?", (self.user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _result_row(self, result: Dict) -> tuple:
+        return (
+            self.user_id,
+            result.get("quiz_id"),
+            result.get("end_time"),
+            result.get("score"),
+            result.get("percentage"),
+            json.dumps(result, ensure_ascii=False),
+        )
+
+    def save_quiz_results(self, results: List[Dict]):
+        """Sauvegarder les résultats de quiz (remplace ceux de l'utilisateur)"""
+        rows = [self._result_row(r) for r in results]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM quiz_results WHERE user_id = ?", (self.user_id,)
+            )
+            self._conn.executemany(
+                "INSERT INTO quiz_results (user_id, quiz_id, end_time, score, "
+                "percentage, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def add_quiz_result(self, result: Dict):
+        """Ajouter un résultat sans réécrire l'historique"""
+        self.add_quiz_results([result])
+
+    def add_quiz_results(self, results: List[Dict]):
+        """Ajouter plusieurs résultats en une transaction"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO quiz_results (user_id, quiz_id, end_time, score, "
+                "percentage, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [self._result_row(r) for r in results],
+            )
+
+    def load_quiz_results(self) -> List[Dict]:
+        """Charger les résultats de quiz"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM quiz_results WHERE user_id = ? ORDER BY id",
+                (self.user_id,),
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def iter_quiz_results(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        user_ids: Optional[List[str]] = None,
+        document: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Dict]:
+        """Parcourir les résultats filtrés en SQL, par paquets
+
+        `start`/`end` bornent end_time (ISO, inclus ; une date seule en `end`
+        couvre toute la journée). `user_ids` à None : tous les utilisateurs
+        de la base (cohorte).
+        """
+        query = "SELECT user_id, data FROM quiz_results WHERE 1 = 1"
+        params: List[Any] = []
+        if start:
+            query += " AND end_time >= ?"
+            params.append(start)
+        if end:
+            bound, exclusive = _end_bound(end)
+            query += " AND end_time < ?" if exclusive else " AND end_time <= ?"
+            params.append(bound)
+        if user_ids is not None:
+            query += f" AND user_id IN ({', '.join('?' * len(user_ids))})"
+            params.extend(user_ids)
+        if document:
+            query += " AND json_extract(data, '$.document') = ?"
+            params.append(document)
+        query += " ORDER BY id"
+
+        # Curseur dédié : les écritures des autres threads ne sont pas bloquées
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for user_id, data in rows:
+                    result = json.loads(data)
+                    result.setdefault("user_id", user_id)
+                    yield result
+        finally:
+            conn.close()
+
+    def load_recent_quiz_results(self, k: int) -> List[Dict]:
+        """Charger les k derniers résultats de quiz"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM quiz_results WHERE user_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (self.user_id, k),
+            ).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def migrate_from_json(
+        self, json_dir: str = None, user_id: str = None
+    ) -> Dict[str, int]:
+        """Importer une seule fois les fichiers JSON de Database
+
+        Les données sont rattachées à `user_id` (par défaut l'utilisateur de
+        cette instance). Retourne le nombre d'éléments importés ; un second
+        appel, même depuis une autre instance, n'importe plus rien.
+        """
+        user_id = user_id or self.user_id
+        nothing = {"profile": 0, "documents": 0, "quiz_results": 0}
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM meta WHERE key = 'json_migrated'"
+            ).fetchone()
+        if done:
+            return nothing
+
+        source = Database(json_dir or self.data_dir)
+        profile = source.load_user_profile()
+        documents = source.load_documents()
+        results = source.load_quiz_results()
+
+        with self._lock, self._conn:
+            # Marquer la migration dans la même transaction que l'import :
+            # une seule instance l'effectue
+            claimed = self._conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now().isoformat(),),
+            ).rowcount
+            if not claimed:
+                return nothing
+            if profile:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO profiles (user_id, data, updated_at) "
+                    "VALUES (?, ?, ?)",
+                    (
+                        user_id,
+                        json.dumps(profile, ensure_ascii=False),
+                        time.time(),
+                    ),
+                )
+            self._conn.executemany(
+                "INSERT INTO documents (user_id, name, data) VALUES (?, ?, ?)",
+                [
+                    (user_id, d.get("name", ""), json.dumps(d, ensure_ascii=False))
+                    for d in documents
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO quiz_results (user_id, quiz_id, end_time, score, "
+                "percentage, data) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id,) + self._result_row(r)[1:] for r in results],
+            )
+
+        return {
+            "profile": 1 if profile else 0,
+            "documents": len(documents),
+            "quiz_results": len(results),
+        }
+
+
+def create_database(user_id: str = DEFAULT_USER_ID) -> Database:
+    """Instancier la base configurée (Config.DATABASE_BACKEND) pour un utilisateur
+
+    Les anciennes données JSON (mono-utilisateur) sont rattachées à
+    l'utilisateur par défaut, jamais à la première session venue.
+    """
+    if not valid_user_id(user_id):
+        raise ValueError(f"Identifiant utilisateur invalide : {user_id!r}")
+    if Config.DATABASE_BACKEND == "sqlite":
+        db = SQLiteDatabase(Config.DATA_DIR, user_id=user_id)
+        db.migrate_from_json(user_id=DEFAULT_USER_ID)
+        return db
+    return Database(user_data_dir(user_id))
@@ -1,62 +1,173 @@
+import io
 import PyPDF2
 import docx
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator
 import streamlit as st
+from config import Config
+from utils.extraction_cache import ExtractionCache
+
+# Cache partagé entre les reruns Streamlit (le module n'est importé qu'une fois)
+_extraction_cache = ExtractionCache(
+    max_entries=Config.EXTRACTION_CACHE_SIZE,
+    cache_dir=Config.EXTRACTION_CACHE_DIR,
+)
 
 
 class DocumentProcessor:
     """Classe pour traiter les documents PDF et DOCX"""
 
+    # À incrémenter dès que la logique d'extraction change (invalide le cache)
+    EXTRACTOR_VERSION = "2"
+
     @staticmethod
-    def extract_text_from_pdf(file) -> tuple[str, int]:
-        """Extraire le texte d'un fichier PDF et retourner (texte, nombre_pages)"""
+    def iter_pdf_pages(file) -> Iterator[str]:
+        """Parcourir les pages d'un PDF une à une (extraction paresseuse)"""
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
+
+    @staticmethod
+    def extract_indexed_text_from_pdf(file) -> tuple[str, List[int]]:
+        """Extraire le texte d'un PDF et retourner (texte, offsets_des_pages)
+
+        offsets_des_pages[i] est la position du premier caractère de la page i
+        dans le texte final.
+        """
         try:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            page_count = len(pdf_reader.pages)
-            return text, page_count
+            parts = []
+            page_offsets = []
+            position = 0
+            for page_text in DocumentProcessor.iter_pdf_pages(file):
+                page_offsets.append(position)
+                parts.append(page_text)
+                parts.append("\n")
+                position += len(page_text) + 1
+            return "".join(parts), page_offsets
         except Exception as e:
             st.error(f"Erreur lors de l'extraction du PDF : {e}")
-            return "", 0
+            return "", []
+
+    @staticmethod
+    def extract_text_from_pdf(file) -> tuple[str, int]:
+        """Extraire le texte d'un fichier PDF et retourner (texte, nombre_pages)"""
+        text, page_offsets = DocumentProcessor.extract_indexed_text_from_pdf(file)
+        return text, len(page_offsets)
 
     @staticmethod
     def extract_text_from_docx(file) -> str:
         """Extraire le texte d'un fichier DOCX"""
         try:
             doc = docx.Document(file)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+            text = "\n".join(paragraph.text for paragraph in doc.paragraphs)
             return text
         except Exception as e:
             st.error(f"Erreur lors de l'extraction du DOCX : {e}")
             return ""
 
     @staticmethod
-    def process_document(file) -> Optional[Dict[str, Any]]:
-        """Traiter un document et retourner les informations"""
-        file_type = file.name.split(".")[-1].lower()
-        page_count = 0
+    def read_bytes(file) -> bytes:
+        """Lire le contenu brut du fichier sans déplacer sa position"""
+        if hasattr(file, "getvalue"):
+            return file.getvalue()
+        position = file.tell()
+        data = file.read()
+        file.seek(position)
+        return data
+
+    @staticmethod
+    def _cache_key(name: str, data: bytes) -> str:
+        file_type = name.split(".")[-1].lower()
+        return ExtractionCache.make_key(
+            data, f"{DocumentProcessor.EXTRACTOR_VERSION}-{file_type}"
+        )
+
+    @staticmethod
+    def get_cached_document(name: str, data: bytes) -> Optional[Dict[str, Any]]:
+        """Retourner l'extraction en cache pour ces octets, si elle existe"""
+        cached = _extraction_cache.get(DocumentProcessor._cache_key(name, data))
+        if cached is not None:
+            cached["name"] = name
+        return cached
+
+    @staticmethod
+    def cache_document(data: bytes, doc_info: Dict[str, Any]):
+        """Mémoriser une extraction (les extractions vides sont ignorées)"""
+        # Ne pas mémoriser les extractions vides (souvent dues à une erreur)
+        if doc_info.get("text"):
+            key = DocumentProcessor._cache_key(doc_info["name"], data)
+            _extraction_cache.put(key, doc_info)
+
+    @staticmethod
+    def extract_document(name: str, data: bytes) -> Optional[Dict[str, Any]]:
+        """Extraire un document depuis ses octets, sans passer par le cache
+
+        Fonction pure et sérialisable : utilisable dans un pool de processus.
+        """
+        file_type = name.split(".")[-1].lower()
 
         if file_type == "pdf":
-            text, page_count = DocumentProcessor.extract_text_from_pdf(file)
+            text, page_offsets = DocumentProcessor.extract_indexed_text_from_pdf(
+                io.BytesIO(data)
+            )
+            word_count = len(text.split())
+            page_count = len(page_offsets)
         elif file_type in ["docx", "doc"]:
-            text = DocumentProcessor.extract_text_from_docx(file)
+            text = DocumentProcessor.extract_text_from_docx(io.BytesIO(data))
+            word_count = len(text.split())
             # For DOCX, estimate pages (average 300 words per page)
-            page_count = max(1, len(text.split()) // 300)
+            page_count = max(1, word_count // 300)
+            # Pages estimées : découpage régulier du texte
+            page_offsets = [i * len(text) // page_count for i in range(page_count)]
         else:
             st.error("Format de fichier non supporté")
             return None
 
         return {
-            "name": file.name,
+            "name": name,
             "type": file_type,
             "text": text,
-            "word_count": len(text.split()),
+            "word_count": word_count,
             "char_count": len(text),
             "page_count": page_count,
+            "page_offsets": page_offsets,
         }
 
+    @staticmethod
+    def process_document(file) -> Optional[Dict[str, Any]]:
+        """Traiter un document et retourner les informations"""
+        file_type = file.name.split(".")[-1].lower()
+        if file_type not in ["pdf", "docx", "doc"]:
+            st.error("Format de fichier non supporté")
+            return None
+
+        data = DocumentProcessor.read_bytes(file)
+        cached = DocumentProcessor.get_cached_document(file.name, data)
+        if cached is not None:
+            return cached
+
+        doc_info = DocumentProcessor.extract_document(file.name, data)
+        if doc_info:
+            DocumentProcessor.cache_document(data, doc_info)
+        return doc_info
+
+    @staticmethod
+    def get_page_range(doc_info: Dict[str, Any], start: int, end: int) -> str:
+        """Retourner le texte des pages [start, end) (index à partir de 0)
+
+        Sans index de pages (anciens documents), le texte complet est retourné.
+        """
+        text = doc_info.get("text", "")
+        page_offsets = doc_info.get("page_offsets")
+        if not page_offsets:
+            return text
+
+        start = max(0, start)
+        if start >= len(page_offsets) or end <= start:
+            return ""
+        start_char = page_offsets[start]
+        end_char = page_offsets[end] if end < len(page_offsets) else len(text)
+        return text[start_char:end_char]
+
     @staticmethod
     def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
         """Diviser le texte en chunks pour le traitement AI"""
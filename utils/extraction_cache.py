@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ExtractionCache:
+    """Cache des extractions de documents, indexé par le contenu du fichier.
+
+    Un niveau mémoire (LRU borné) et un niveau disque optionnel (un fichier
+    JSON par document).
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data: bytes, version: str) -> str:
+        """Calculer la clé de cache à partir des octets et de la version de l'extracteur"""
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{version}-{digest}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Récupérer une extraction (mémoire puis disque)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return dict(entry)
+
+        entry = self._read_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+            return dict(entry)
+        return None
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Enregistrer une extraction dans les deux niveaux"""
+        entry = dict(entry)
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def clear(self):
+        """Vider le niveau mémoire"""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        filepath = self._disk_path(key)
+        if not os.path.exists(filepath):
+            return None
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        if not self.cache_dir:
+            return
+        filepath = self._disk_path(key)
+        tmp_path = f"{filepath}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, filepath)
+        except OSError:
+            # Le niveau disque est facultatif : on garde l'entrée en mémoire
+            pass
@@ -0,0 +1,117 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+from utils.ai_clients import submit_async
+from utils.document_processor import DocumentProcessor
+from utils.retrieval import DocumentIndex
+
+# on_progress(nb_terminés, total, nom_du_fichier)
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def ingest_documents(
+    files,
+    ai_gen,
+    discipline: str,
+    niveau: str,
+    on_progress: Optional[ProgressCallback] = None,
+    extraction_workers: Optional[int] = None,
+    summary_concurrency: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Extraire et résumer plusieurs documents en pipeline
+
+    L'extraction (CPU) tourne dans un pool de processus, les résumés (appels
+    réseau) sur la boucle async partagée, avec un nombre d'appels simultanés
+    borné. Chaque résumé démarre dès que l'extraction de son fichier est
+    terminée. Les documents sont retournés dans l'ordre des fichiers, la
+    progression est signalée dans le thread appelant à chaque fichier terminé.
+    """
+    extraction_workers = extraction_workers or Config.EXTRACTION_WORKERS
+    summary_concurrency = summary_concurrency or Config.SUMMARY_CONCURRENCY
+
+    inputs = [(file.name, DocumentProcessor.read_bytes(file)) for file in files]
+    documents: List[Optional[Dict[str, Any]]] = [None] * len(inputs)
+    total = len(inputs)
+    done = 0
+
+    def report(idx: int):
+        nonlocal done
+        done += 1
+        if on_progress:
+            on_progress(done, total, inputs[idx][0])
+
+    # Les documents déjà en cache n'ont pas besoin du pool de processus
+    to_extract = []
+    for idx, (name, data) in enumerate(inputs):
+        cached = DocumentProcessor.get_cached_document(name, data)
+        if cached is not None:
+            documents[idx] = cached
+        else:
+            to_extract.append(idx)
+
+    extract_pool = (
+        ProcessPoolExecutor(max_workers=min(extraction_workers, len(to_extract)))
+        if len(to_extract) > 1
+        else None
+    )
+    semaphore = asyncio.Semaphore(max(1, summary_concurrency))
+
+    async def summarize(doc_info: Dict[str, Any]):
+        async with semaphore:
+            return await ai_gen.agenerate_summary(
+                doc_info["text"],
+                discipline,
+                niveau,
+                doc_info.get("page_count", 0),
+            )
+
+    try:
+        pending = {}
+
+        def submit_summary(idx: int):
+            # Index de recherche construit une fois, réutilisé à chaque quiz
+            documents[idx]["index"] = DocumentIndex.from_text(documents[idx]["text"])
+            future = submit_async(summarize(documents[idx]))
+            pending[future] = ("summary", idx)
+
+        for idx, doc_info in enumerate(documents):
+            if doc_info is not None:
+                submit_summary(idx)
+
+        for idx in to_extract:
+            name, data = inputs[idx]
+            if extract_pool is None:
+                documents[idx] = DocumentProcessor.extract_document(name, data)
+                if documents[idx]:
+                    DocumentProcessor.cache_document(data, documents[idx])
+                    submit_summary(idx)
+                else:
+                    report(idx)
+            else:
+                future = extract_pool.submit(
+                    DocumentProcessor.extract_document, name, data
+                )
+                pending[future] = ("extract", idx)
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, idx = pending.pop(future)
+                if stage == "extract":
+                    documents[idx] = future.result()
+                    if documents[idx]:
+                        DocumentProcessor.cache_document(inputs[idx][1], documents[idx])
+                        submit_summary(idx)
+                    else:
+                        report(idx)
+                else:
+                    documents[idx]["summary"] = future.result()
+                    report(idx)
+    finally:
+        if extract_pool is not None:
+            extract_pool.shutdown(cancel_futures=True)
+        for future in pending:
+            future.cancel()
+
+    return [doc for doc in documents if doc]
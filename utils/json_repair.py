@@ -0,0 +1,199 @@
+import json
+import re
+from typing import Any, List, Optional
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ParseReport:
+    """Résultat d'une extraction JSON tolérante
+
+    `data` vaut None si rien n'a pu être récupéré ; `repairs` liste les
+    corrections appliquées et `dropped` ce qui a été abandonné.
+    """
+
+    def __init__(
+        self,
+        data: Any = None,
+        repairs: Optional[List[str]] = None,
+        dropped: Optional[List[str]] = None,
+    ):
+        self.data = data
+        self.repairs = repairs or []
+        self.dropped = dropped or []
+
+    @property
+    def ok(self) -> bool:
+        return self.data is not None
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Supprimer les virgules placées juste avant } ou ] (hors chaînes)"""
+    out = []
+    in_string = False
+    escape = False
+    pending_comma = None
+    for c in text:
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if c.isspace():
+                pending_comma.append(c)
+                continue
+            if c not in "}]":
+                out.append(",")
+            out.extend(pending_comma)
+            pending_comma = None
+        if c == ",":
+            pending_comma = []
+            continue
+        if c == '"':
+            in_string = True
+        out.append(c)
+    if pending_comma is not None:
+        out.append(",")
+        out.extend(pending_comma)
+    return "".join(out)
+
+
+def _close_truncated(text: str, max_attempts: int = 200) -> Optional[Any]:
+    """Réparer un JSON tronqué en coupant au dernier élément complet
+
+    On mémorise, hors chaînes, les positions sûres (avant une virgule, après
+    un crochet ouvrant ou fermant) avec la pile des crochets ouverts, puis
+    on essaie de refermer la structure à partir de la plus tardive.
+    """
+    stack: List[str] = []
+    cuts = []
+    in_string = False
+    escape = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c in _CLOSERS:
+            stack.append(_CLOSERS[c])
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif c in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                # Structure complète : inutile d'aller plus loin
+                cuts.append((i + 1, ""))
+                break
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif c == "," and stack:
+            cuts.append((i, "".join(reversed(stack))))
+    else:
+        # Texte coupé en plein milieu d'une valeur : tenter de la refermer
+        if stack:
+            closing = "".join(reversed(stack))
+            cuts.append((len(text), ('"' if in_string else "") + closing))
+
+    for pos, closing in reversed(cuts[-max_attempts:]):
+        try:
+            return json.loads(_remove_trailing_commas(text[:pos] + closing))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def loads_lenient(text: str) -> Any:
+    """json.loads tolérant aux virgules finales (lève JSONDecodeError sinon)"""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_remove_trailing_commas(text))
+
+
+def parse_model_json(
+    text: Optional[str], list_key: Optional[str] = None
+) -> ParseReport:
+    """Extraire l'objet JSON d'une réponse de modèle en réparant si besoin
+
+    Gère les blocs ```json, le texte avant/après l'objet, les virgules
+    finales et les réponses tronquées. Avec `list_key`, les éléments
+    complets de cette liste sont récupérés même si le reste est illisible.
+    """
+    report = ParseReport()
+    if not text:
+        report.dropped.append("réponse vide")
+        return report
+
+    cleaned = _FENCE_RE.sub("", text)
+    start = cleaned.find("{")
+    if start == -1:
+        report.dropped.append("aucun objet JSON dans la réponse")
+        return report
+    candidate = cleaned[start:]
+
+    # 1. Objet complet, éventuellement suivi de texte
+    try:
+        report.data, end = json.JSONDecoder().raw_decode(candidate)
+        if candidate[end:].strip():
+            report.repairs.append("texte après l'objet JSON ignoré")
+        return report
+    except json.JSONDecodeError:
+        pass
+
+    # 2. Virgules finales
+    end = candidate.rfind("}")
+    if end != -1:
+        try:
+            report.data = json.loads(_remove_trailing_commas(candidate[: end + 1]))
+            report.repairs.append("virgules finales supprimées")
+            return report
+        except json.JSONDecodeError:
+            pass
+
+    # 3. Réponse tronquée : refermer au dernier élément complet
+    data = _close_truncated(candidate)
+
+    # 4. Ne garder que les éléments de la liste dont l'accolade fermante est
+    # arrivée : la fermeture en milieu de valeur (étape 3) produit sinon un
+    # dernier élément tronqué ("correct_answer": "Gam"). Les éléments
+    # complets situés après un élément mal formé sont aussi récupérés.
+    if list_key:
+        # Import local : json_stream dépend lui-même de ce module
+        from utils.json_stream import JsonArrayStream
+
+        items = JsonArrayStream(list_key).feed(candidate)
+        current = data.get(list_key) if isinstance(data, dict) else None
+        current_count = (
+            sum(1 for item in current if item) if isinstance(current, list) else 0
+        )
+        if items or current is not None:
+            data = dict(data) if isinstance(data, dict) else {}
+            data[list_key] = items
+            if len(items) > current_count:
+                report.repairs.append(
+                    f"{len(items)} élément(s) '{list_key}' récupéré(s)"
+                )
+                report.dropped.append(f"élément(s) '{list_key}' illisible(s) ignoré(s)")
+            elif len(items) < current_count:
+                report.dropped.append(f"dernier élément '{list_key}' incomplet ignoré")
+
+    if data:
+        report.data = data
+        report.repairs.append("réponse tronquée refermée")
+        report.dropped.append("fin de réponse incomplète")
+        return report
+
+    report.dropped.append("JSON irréparable")
+    return report
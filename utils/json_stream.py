@@ -0,0 +1,83 @@
+import json
+import re
+from typing import Any, Dict, List
+from utils.json_repair import loads_lenient
+
+
+class JsonArrayStream:
+    """Extraire au fil de l'eau les objets d'un tableau JSON
+
+    Le texte du modèle est fourni morceau par morceau via `feed` ; chaque
+    objet du tableau `key` (ex: "questions") est retourné dès que son
+    accolade fermante arrive. Seul l'objet en cours est gardé en mémoire.
+    """
+
+    def __init__(self, key: str = "questions"):
+        self.key = key
+        self._key_re = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self.buffer = ""
+        self.in_array = False
+        self.closed = False
+        self.count = 0
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._obj_start = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Ajouter du texte et retourner les objets complétés par ce morceau"""
+        if self.closed:
+            return []
+        self.buffer += chunk
+
+        if not self.in_array:
+            match = self._key_re.search(self.buffer)
+            if not match:
+                return []
+            self.in_array = True
+            self.buffer = self.buffer[match.end() :]
+            self._pos = 0
+
+        objects = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer):
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                if self._depth == 0:
+                    self._obj_start = i
+                self._depth += 1
+            elif c == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0 and self._obj_start is not None:
+                    try:
+                        objects.append(loads_lenient(buffer[self._obj_start : i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._obj_start = None
+            elif c == "]" and self._depth == 0:
+                self.closed = True
+                break
+            i += 1
+
+        # Ne garder que l'objet en cours de réception
+        if self._obj_start is None:
+            self.buffer = ""
+            self._pos = 0
+        else:
+            self.buffer = buffer[self._obj_start :]
+            self._pos = i - self._obj_start
+            self._obj_start = 0
+
+        self.count += len(objects)
+        return objects
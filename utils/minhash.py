@@ -0,0 +1,162 @@
+import hashlib
+import re
+import zlib
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+# Nombre premier de Mersenne 2^61 - 1 pour les permutations (a*x + b) mod p
+_PRIME = np.uint64((1 << 61) - 1)
+_SHINGLE_CHARS = 5
+# Ponctuation écartée ; chiffres et opérateurs sont gardés ("2+2" != "2+1")
+_SEPARATORS_RE = re.compile(r"[^\w+\-*/=<>^%×÷]+")
+
+
+def _normalize(text: str) -> str:
+    return _SEPARATORS_RE.sub(" ", text.lower()).strip()
+
+
+def question_text(question: Dict[str, Any]) -> str:
+    """Texte comparé pour une question : énoncé et choix de réponse"""
+    options = question.get("options") or []
+    if not isinstance(options, list):
+        options = []
+    return " ".join([str(question.get("question", ""))] + [str(o) for o in options])
+
+
+def answer_key(question: Dict[str, Any]) -> str:
+    """Réponse attendue et choix (dans n'importe quel ordre), normalisés
+
+    Deux énoncés très proches dont la réponse diffère ("Que vaut 2+2 ?",
+    "Que vaut 2+1 ?") ne sont pas des doublons.
+    """
+    options = question.get("options") or []
+    if not isinstance(options, list):
+        options = []
+    answer = _normalize(str(question.get("correct_answer", "")))
+    return "|".join([answer] + sorted(_normalize(str(o)) for o in options))
+
+
+def shingles(text: str, size: int = _SHINGLE_CHARS) -> List[str]:
+    """Fenêtres de `size` caractères du texte normalisé"""
+    normalized = _normalize(text)
+    if len(normalized) <= size:
+        return [normalized] if normalized else []
+    return [normalized[i : i + size] for i in range(len(normalized) - size + 1)]
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bandes, lignes par bande) pour un seuil de Jaccard donné
+
+    On retient le seuil de collision (1/b)^(1/r) le plus proche de
+    `threshold` par en dessous : les candidats sont ensuite vérifiés sur la
+    signature complète, mieux vaut en trouver trop que pas assez.
+    """
+    best = (num_perm, 1)
+    best_point = 0.0
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        point = (1 / bands) ** (1 / rows)
+        if best_point < point <= threshold:
+            best, best_point = (bands, rows), point
+    return best
+
+
+class MinHasher:
+    """Signatures MinHash calculées en bloc avec NumPy"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        # a, b < 2^32 : a * x (x < 2^32) tient dans un uint64
+        self._a = rng.randint(1, 2**32 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Signature du texte (None s'il est vide)"""
+        grams = shingles(text)
+        if not grams:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(g.encode("utf-8")) for g in set(grams)),
+            dtype=np.uint64,
+        )
+        permuted = (np.multiply.outer(hashes, self._a) % _PRIME + self._b) % _PRIME
+        return permuted.min(axis=0)
+
+
+def similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimation de la similarité de Jaccard entre deux signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+
+def band_hashes(signature: np.ndarray, bands: int, rows: int) -> List[int]:
+    """Hash stable (entier signé 64 bits) de chaque bande de la signature"""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                signature[band * rows : (band + 1) * rows].tobytes(), digest_size=8
+            ).digest(),
+            "big",
+            signed=True,
+        )
+        for band in range(bands)
+    ]
+
+
+class LshIndex:
+    """Index LSH en mémoire pour retrouver les quasi-doublons
+
+    Seuls les éléments partageant au moins une bande avec la requête sont
+    comparés, sans comparaison deux à deux sur tout l'index. Avec `group`
+    (ex. `answer_key`), seuls les éléments du même groupe sont des doublons.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128):
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [
+            {} for _ in range(self.bands)
+        ]
+        self._signatures: Dict[Hashable, np.ndarray] = {}
+        self._groups: Dict[Hashable, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        rows = self.rows
+        return [
+            signature[band * rows : (band + 1) * rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def query(self, signature: np.ndarray, group: Hashable = None) -> List[Hashable]:
+        """Clés des éléments du groupe au moins aussi similaires que le seuil"""
+        candidates = set()
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(buckets.get(band_key, ()))
+        return [
+            key
+            for key in candidates
+            if self._groups[key] == group
+            and similarity(signature, self._signatures[key]) >= self.threshold
+        ]
+
+    def add(self, key: Hashable, signature: np.ndarray, group: Hashable = None):
+        self._signatures[key] = signature
+        self._groups[key] = group
+        for buckets, band_key in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band_key, []).append(key)
+
+    def add_unique(self, key: Hashable, text: str, group: Hashable = None) -> bool:
+        """Indexer le texte sauf s'il est proche d'un élément du même groupe"""
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return True
+        if self.query(signature, group):
+            return False
+        self.add(key, signature, group)
+        return True
@@ -0,0 +1,232 @@
+import atexit
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import streamlit as st
+from config import Config
+from utils.database import Database, create_database, valid_user_id
+
+# (type d'opération, utilisateur, données)
+Operation = Tuple[str, str, Any]
+
+
+class WriteBehind:
+    """Écriture différée vers Database depuis les pages
+
+    Les pages déposent leurs changements dans une file bornée ; un thread
+    les écrit par lots (résultats regroupés, seul le dernier état des
+    documents et du profil est gardé). Si la file est pleine, l'écriture se
+    fait directement dans le thread appelant. La file est vidée à l'arrêt.
+
+    Seules les `max_databases` bases les plus récemment utilisées sont
+    gardées : chaque visite sans ?user= crée un nouvel utilisateur.
+    """
+
+    def __init__(
+        self,
+        database_factory: Callable[[str], Database] = create_database,
+        max_queue: int = 1000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_databases: int = 256,
+    ):
+        self._factory = database_factory
+        self._databases: "OrderedDict[str, Database]" = OrderedDict()
+        self.max_databases = max_databases
+        self._databases_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[Operation]]" = queue.Queue(max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error: Optional[Exception] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def database(self, user_id: str) -> Database:
+        with self._databases_lock:
+            if user_id in self._databases:
+                self._databases.move_to_end(user_id)
+            else:
+                self._databases[user_id] = self._factory(user_id)
+                while len(self._databases) > self.max_databases:
+                    self._databases.popitem(last=False)
+            return self._databases[user_id]
+
+    def add_quiz_result(self, user_id: str, result: Dict):
+        self._submit(("result", user_id, dict(result)))
+
+    def save_documents(self, user_id: str, documents: List[Dict]):
+        # Copie allégée : la liste de la session peut changer avant l'écriture
+        light = [
+            {k: v for k, v in doc.items() if k not in ("text", "index")}
+            for doc in documents
+        ]
+        self._submit(("documents", user_id, light))
+
+    def save_user_profile(self, user_id: str, profile: Dict):
+        self._submit(("profile", user_id, dict(profile)))
+
+    def save_recommendations(self, user_id: str, entry: Dict):
+        self._submit(("recommendations", user_id, dict(entry)))
+
+    def _submit(self, operation: Operation):
+        if self._closed or not self._thread.is_alive():
+            self._write([operation])
+            return
+        try:
+            self._queue.put(operation, timeout=0.05)
+        except queue.Full:
+            self._write([operation])
+
+    def _run(self):
+        while True:
+            try:
+                operation = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [operation]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            operations = [op for op in batch if op is not None]
+            try:
+                self._write(operations)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                return
+
+    def _write(self, operations: List[Operation]):
+        """Écrire un lot : une transaction par utilisateur et par type"""
+        results: Dict[str, List[Dict]] = {}
+        latest: Dict[Tuple[str, str], Any] = {}
+        for kind, user_id, data in operations:
+            if kind == "result":
+                results.setdefault(user_id, []).append(data)
+            else:
+                latest[(kind, user_id)] = data
+
+        methods = {
+            "documents": "save_documents",
+            "recommendations": "save_recommendations",
+            "profile": "save_user_profile",
+        }
+        with self._write_lock:
+            for user_id, user_results in results.items():
+                self._attempt(user_id, "add_quiz_results", user_results)
+            for (kind, user_id), data in latest.items():
+                self._attempt(user_id, methods[kind], data)
+
+    def _attempt(self, user_id: str, method: str, data: Any):
+        try:
+            # L'ouverture de la base aussi peut échouer (disque, migration)
+            getattr(self.database(user_id), method)(data)
+        except Exception as e:
+            # Le thread d'écriture ne doit pas s'arrêter sur une erreur disque
+            self.last_error = e
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Attendre que toutes les écritures en file soient faites
+
+        Retourne False si elles ne sont pas terminées après `timeout`
+        secondes ou si le thread d'écriture est arrêté.
+        """
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    return False
+                self._queue.all_tasks_done.wait(min(remaining, 0.1))
+        return True
+
+    def close(self):
+        """Vider la file puis arrêter le thread (appelé à l'arrêt du processus)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+
+_writer: Optional[WriteBehind] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehind:
+    """Écriture différée partagée par toutes les sessions du processus"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = WriteBehind(
+                max_queue=Config.PERSIST_QUEUE_SIZE,
+                flush_interval=Config.PERSIST_FLUSH_SECONDS,
+            )
+        return _writer
+
+
+def restore_session():
+    """Recharger profil, documents et résultats au premier affichage
+
+    L'identifiant utilisateur est gardé dans l'URL (?user=...) pour
+    retrouver ses données après un rechargement de la page ; les données
+    d'avant le multi-utilisateur sont celles de ?user=default.
+    """
+    if not st.session_state.get("session_restored"):
+        user_id = st.query_params.get("user")
+        if not valid_user_id(user_id):
+            user_id = uuid.uuid4().hex
+        st.session_state.user_id = user_id
+
+        writer = get_writer()
+        writer.flush()
+        db = writer.database(user_id)
+        profile = db.load_user_profile()
+        for key in ("profile", "discipline", "niveau"):
+            if st.session_state.get(key) is None and profile.get(key):
+                st.session_state[key] = profile[key]
+        st.session_state.saved_profile = profile
+        if "documents" not in st.session_state:
+            # Le texte n'est pas sauvegardé : ces documents sont à ré-uploader
+            # pour générer un quiz, leurs résumés restent consultables
+            st.session_state.documents = db.load_documents()
+        if "quiz_results" not in st.session_state:
+            st.session_state.quiz_results = db.load_quiz_results()
+        st.session_state.saved_recommendations = db.load_recommendations()
+        st.session_state.session_restored = True
+
+    # st.switch_page vide les paramètres de l'URL
+    if st.query_params.get("user") != st.session_state.user_id:
+        st.query_params["user"] = st.session_state.user_id
+
+
+def persist_profile():
+    """Sauvegarder le profil s'il a changé depuis la dernière sauvegarde"""
+    profile = {
+        key: st.session_state.get(key) for key in ("profile", "discipline", "niveau")
+    }
+    if profile != st.session_state.get("saved_profile"):
+        get_writer().save_user_profile(st.session_state.user_id, profile)
+        st.session_state.saved_profile = profile
+
+
+def persist_documents():
+    get_writer().save_documents(st.session_state.user_id, st.session_state.documents)
+
+
+def persist_quiz_result(result: Dict):
+    get_writer().add_quiz_result(st.session_state.user_id, result)
+
+
+def persist_recommendations(entry: Dict):
+    """Sauvegarder les recommandations générées avec leur empreinte"""
+    st.session_state.saved_recommendations = entry
+    get_writer().save_recommendations(st.session_state.user_id, entry)
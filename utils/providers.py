@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from config import Config
+from utils.ai_clients import PROVIDER_ENDPOINTS
+
+
+def provider_chain(primary: str) -> List[str]:
+    """Ordre de repli : le provider configuré puis ceux de Config.MODELS ayant une clé"""
+    chain = [primary]
+    for provider in Config.MODELS:
+        if provider == primary or provider not in PROVIDER_ENDPOINTS:
+            continue
+        key_name, _ = PROVIDER_ENDPOINTS[provider]
+        if getattr(Config, key_name, None):
+            chain.append(provider)
+    return chain
+
+
+class ProviderHealth:
+    """Suivi de santé des providers (latences récentes et échecs consécutifs)
+
+    Après PROVIDER_MAX_FAILURES échecs consécutifs, un provider est mis de
+    côté pendant PROVIDER_COOLDOWN_SECONDS : il passe en fin de chaîne.
+    """
+
+    def __init__(self, window: int = 50):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._failures: Dict[str, int] = {}
+        self._cooldown_until: Dict[str, float] = {}
+
+    def record_success(self, provider: str, latency: float):
+        with self._lock:
+            self._latencies.setdefault(provider, deque(maxlen=self.window)).append(
+                latency
+            )
+            self._failures[provider] = 0
+            self._cooldown_until.pop(provider, None)
+
+    def record_failure(self, provider: str):
+        with self._lock:
+            failures = self._failures.get(provider, 0) + 1
+            self._failures[provider] = failures
+            if failures >= Config.PROVIDER_MAX_FAILURES:
+                self._cooldown_until[provider] = (
+                    time.monotonic() + Config.PROVIDER_COOLDOWN_SECONDS
+                )
+
+    def is_available(self, provider: str) -> bool:
+        with self._lock:
+            return self._cooldown_until.get(provider, 0) <= time.monotonic()
+
+    def order(self, providers: List[str]) -> List[str]:
+        """Providers disponibles d'abord, en conservant l'ordre de la chaîne"""
+        available = [p for p in providers if self.is_available(p)]
+        return available + [p for p in providers if p not in available]
+
+    def p95(self, provider: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def hedge_delay(self, provider: str) -> float:
+        """Délai avant de lancer une requête de couverture sur le provider suivant"""
+        p95 = self.p95(provider)
+        if p95 is None:
+            return Config.HEDGE_DEFAULT_DELAY_SECONDS
+        return max(Config.HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+# Partagé par tout le processus
+provider_health = ProviderHealth()
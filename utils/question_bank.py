@@ -0,0 +1,387 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from config import Config
+from utils.minhash import (
+    MinHasher,
+    answer_key,
+    band_hashes,
+    lsh_params,
+    question_text,
+)
+import numpy as np
+
+
+def question_key(question: Dict[str, Any]) -> str:
+    """Texte normalisé d'une question (détection des doublons exacts)"""
+    return re.sub(r"\W+", " ", str(question.get("question", "")).lower()).strip()
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """Empreinte du texte d'un document, calculée une fois puis gardée dans doc"""
+    if "text_hash" not in doc:
+        doc["text_hash"] = hashlib.sha256(doc["text"].encode("utf-8")).hexdigest()
+    return doc["text_hash"]
+
+
+class QuestionBank:
+    """Banque persistante (SQLite) des questions générées
+
+    Les questions sont rangées par document (empreinte du texte), type de
+    quiz, difficulté et compétence. Un nouveau quiz est tiré de la banque
+    en évitant les questions déjà servies à l'utilisateur ; le modèle ne
+    complète que ce qui manque.
+
+    Les quasi-doublons (similarité MinHash >= `threshold`) sont écartés à
+    l'ajout : les bandes LSH des signatures sont indexées dans SQLite, seules
+    les questions partageant une bande sont comparées.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.8, num_perm: int = 128):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS questions (
+                id INTEGER PRIMARY KEY,
+                doc_hash TEXT NOT NULL,
+                quiz_type TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                competence TEXT NOT NULL,
+                question_key TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                signature BLOB,
+                UNIQUE (doc_hash, quiz_type, difficulty, question_key)
+            )""")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(questions)")]
+        if "signature" not in columns:
+            self._conn.execute("ALTER TABLE questions ADD COLUMN signature BLOB")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_questions_lookup "
+            "ON questions (doc_hash, quiz_type, difficulty, competence)"
+        )
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS served (
+                user_id TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                served_at REAL NOT NULL,
+                PRIMARY KEY (user_id, question_id)
+            )""")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS question_bands (
+                scope TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                question_id INTEGER NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_question_bands "
+            "ON question_bands (scope, band, bucket)"
+        )
+        self._conn.commit()
+        self._index_unsigned()
+
+    @staticmethod
+    def _scope(doc_hash: str, quiz_type: str, difficulty: str) -> str:
+        return f"{doc_hash}|{quiz_type}|{difficulty}"
+
+    def _index(self, question_id: int, scope: str, signature: np.ndarray):
+        self._conn.execute(
+            "UPDATE questions SET signature = ? WHERE id = ?",
+            (signature.tobytes(), question_id),
+        )
+        self._conn.executemany(
+            "INSERT INTO question_bands (scope, band, bucket, question_id) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (scope, band, bucket, question_id)
+                for band, bucket in enumerate(
+                    band_hashes(signature, self.bands, self.rows)
+                )
+            ],
+        )
+
+    def _index_unsigned(self):
+        """Indexer les questions enregistrées sans signature"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, doc_hash, quiz_type, difficulty, data FROM questions "
+                "WHERE signature IS NULL"
+            ).fetchall()
+            for question_id, doc_hash, quiz_type, difficulty, data in rows:
+                signature = self.hasher.signature(question_text(json.loads(data)))
+                if signature is not None:
+                    scope = self._scope(doc_hash, quiz_type, difficulty)
+                    self._index(question_id, scope, signature)
+            self._conn.commit()
+
+    def _find_similar(
+        self, scope: str, signature: np.ndarray, answer: str
+    ) -> Optional[int]:
+        """Identifiant d'une question proche dans `scope`, s'il y en a une
+
+        Une question proche n'est un doublon que si la réponse attendue et
+        les choix sont les mêmes (`answer_key`).
+        """
+        buckets = band_hashes(signature, self.bands, self.rows)
+        # Une sous-requête par bande : chacune utilise tout l'index
+        union = " UNION ".join(
+            [
+                "SELECT question_id FROM question_bands "
+                "WHERE scope = ? AND band = ? AND bucket = ?"
+            ]
+            * len(buckets)
+        )
+        params: List[Any] = []
+        for band, bucket in enumerate(buckets):
+            params.extend((scope, band, bucket))
+        rows = self._conn.execute(
+            f"SELECT id, signature, data FROM questions WHERE id IN ({union})",
+            params,
+        ).fetchall()
+        if rows:
+            candidates = np.frombuffer(
+                b"".join(blob for _, blob, _ in rows), dtype=np.uint64
+            ).reshape(len(rows), -1)
+            scores = (candidates == signature).mean(axis=1)
+            for best in np.argsort(-scores, kind="stable"):
+                if scores[best] < self.threshold:
+                    break
+                question_id, _, data = rows[best]
+                if answer_key(json.loads(data)) == answer:
+                    return question_id
+        return None
+
+    def add(
+        self,
+        doc_hash: str,
+        quiz_type: str,
+        difficulty: str,
+        question: Dict[str, Any],
+    ) -> Optional[int]:
+        """Ajouter une question ; retourne son identifiant, None si déjà en banque
+
+        Une question quasi identique à une question de la banque (même
+        document, type et difficulté) compte comme déjà en banque.
+        """
+        question_id, created = self.add_or_find(
+            doc_hash, quiz_type, difficulty, question
+        )
+        return question_id if created else None
+
+    def add_or_find(
+        self,
+        doc_hash: str,
+        quiz_type: str,
+        difficulty: str,
+        question: Dict[str, Any],
+    ) -> Tuple[int, bool]:
+        """Identifiant de la question en banque et si elle vient d'être ajoutée
+
+        Pour une question (quasi) identique déjà en banque, c'est
+        l'identifiant de celle-ci qui est retourné.
+        """
+        data = {k: v for k, v in question.items() if k not in ("id", "bank_id")}
+        scope = self._scope(doc_hash, quiz_type, difficulty)
+        key = question_key(question)
+        signature = self.hasher.signature(question_text(question))
+        with self._lock:
+            if signature is not None:
+                similar = self._find_similar(scope, signature, answer_key(question))
+                if similar is not None:
+                    return similar, False
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO questions (doc_hash, quiz_type, difficulty, "
+                "competence, question_key, data, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    doc_hash,
+                    quiz_type,
+                    difficulty,
+                    question.get("competence", "Général"),
+                    key,
+                    json.dumps(data, ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+            if not cursor.rowcount:
+                row = self._conn.execute(
+                    "SELECT id FROM questions WHERE doc_hash = ? AND quiz_type = ? "
+                    "AND difficulty = ? AND question_key = ?",
+                    (doc_hash, quiz_type, difficulty, key),
+                ).fetchone()
+                return row[0], False
+            question_id = cursor.lastrowid
+            if signature is not None:
+                self._index(question_id, scope, signature)
+            self._conn.commit()
+            return question_id, True
+
+    def count(
+        self,
+        doc_hash: str,
+        quiz_type: str,
+        difficulty: str,
+        user_id: Optional[str] = None,
+    ) -> int:
+        """Nombre de questions en banque (non encore servies à user_id si fourni)"""
+        query = (
+            "SELECT COUNT(*) FROM questions "
+            "WHERE doc_hash = ? AND quiz_type = ? AND difficulty = ?"
+        )
+        params: List[Any] = [doc_hash, quiz_type, difficulty]
+        if user_id is not None:
+            query += " AND id NOT IN (SELECT question_id FROM served WHERE user_id = ?)"
+            params.append(user_id)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone()[0]
+
+    def sample(
+        self,
+        doc_hash: str,
+        quiz_type: str,
+        difficulty: str,
+        n: int,
+        user_id: Optional[str] = None,
+        competence: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Tirer au hasard jusqu'à n questions jamais servies à user_id
+
+        Les questions tirées sont marquées comme servies à cet utilisateur.
+        """
+        query = (
+            "SELECT id, data FROM questions "
+            "WHERE doc_hash = ? AND quiz_type = ? AND difficulty = ?"
+        )
+        params: List[Any] = [doc_hash, quiz_type, difficulty]
+        if competence is not None:
+            query += " AND competence = ?"
+            params.append(competence)
+        if user_id is not None:
+            query += " AND id NOT IN (SELECT question_id FROM served WHERE user_id = ?)"
+            params.append(user_id)
+        query += " ORDER BY random() LIMIT ?"
+        params.append(n)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        questions = []
+        for bank_id, data in rows:
+            question = json.loads(data)
+            question["bank_id"] = bank_id
+            questions.append(question)
+        if user_id is not None:
+            self.mark_served(user_id, [q["bank_id"] for q in questions])
+        return questions
+
+    def mark_served(self, user_id: str, question_ids: Iterable[int]):
+        """Retenir que ces questions ont été proposées à l'utilisateur"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO served (user_id, question_id, served_at) "
+                "VALUES (?, ?, ?)",
+                [(user_id, qid, now) for qid in question_ids],
+            )
+            self._conn.commit()
+
+    def was_served(self, user_id: str, question_id: int) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM served WHERE user_id = ? AND question_id = ?",
+                (user_id, question_id),
+            ).fetchone()
+        return row is not None
+
+    def collect(
+        self,
+        questions: Iterable[Dict[str, Any]],
+        doc_hash: str,
+        quiz_type: str,
+        difficulty: str,
+        user_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        exclude: Optional[Set[int]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Enregistrer les questions générées au fil de l'eau
+
+        Une question générée déjà en banque est retransmise si l'utilisateur
+        ne l'a jamais vue ; sinon elle est gardée en réserve et ne sert qu'à
+        compléter le quiz jusqu'à `limit`. Les questions de `exclude` (déjà
+        dans le quiz) ne sont jamais répétées ; l'ensemble est mis à jour
+        avec les questions retransmises.
+        """
+        exclude = exclude if exclude is not None else set()
+        reserve: List[Tuple[Dict[str, Any], int]] = []
+        yielded = 0
+
+        def serve(question: Dict[str, Any], bank_id: int) -> Dict[str, Any]:
+            question["bank_id"] = bank_id
+            exclude.add(bank_id)
+            if user_id is not None:
+                self.mark_served(user_id, [bank_id])
+            return question
+
+        for question in questions:
+            if limit is not None and yielded >= limit:
+                break
+            bank_id, created = self.add_or_find(
+                doc_hash, quiz_type, difficulty, question
+            )
+            if bank_id in exclude:
+                continue
+            if (
+                not created
+                and user_id is not None
+                and self.was_served(user_id, bank_id)
+            ):
+                reserve.append((question, bank_id))
+                continue
+            yielded += 1
+            yield serve(question, bank_id)
+
+        # Pas assez de questions nouvelles : compléter avec celles déjà vues
+        for question, bank_id in reserve:
+            if limit is None or yielded >= limit:
+                break
+            if bank_id in exclude:
+                continue
+            yielded += 1
+            yield serve(question, bank_id)
+
+    def clear(self):
+        """Vider la banque"""
+        with self._lock:
+            self._conn.execute("DELETE FROM served")
+            self._conn.execute("DELETE FROM question_bands")
+            self._conn.execute("DELETE FROM questions")
+            self._conn.commit()
+
+
+_question_bank: Optional[QuestionBank] = None
+_question_bank_lock = threading.Lock()
+
+
+def get_question_bank() -> Optional[QuestionBank]:
+    """Banque partagée par le processus (None si désactivée)"""
+    global _question_bank
+    if not Config.QUESTION_BANK_ENABLED:
+        return None
+    with _question_bank_lock:
+        if _question_bank is None:
+            _question_bank = QuestionBank(
+                Config.QUESTION_BANK_PATH,
+                threshold=Config.DEDUP_THRESHOLD,
+                num_perm=Config.MINHASH_PERMUTATIONS,
+            )
+        return _question_bank
@@ -1,5 +1,8 @@
-from typing import Dict, List
-import re
+from typing import Dict, List, Optional
+import numpy as np
+from config import Config
+from utils.answer_matcher import matcher_for
+from utils.quiz_stats import QuizStatistics
 
 
 class QuizManager:
@@ -41,7 +44,7 @@ class QuizManager:
             else:  # Question ouverte
                 # Évaluation simple par mots-clés
                 correct = self._evaluate_open_question(
-                    user_answer, question["correct_answer"]
+                    user_answer, question["correct_answer"], question.get("key_phrases")
                 )
                 if correct:
                     points = question.get("points", 1)
@@ -88,46 +91,158 @@ class QuizManager:
             "weak_areas": weak_areas[:5],  # Top 5 points faibles
         }
 
-    def _evaluate_open_question(self, user_answer: str, correct_answer: str) -> bool:
-        """Évaluer une question ouverte (simple)"""
-        # Normaliser les textes
-        user_lower = user_answer.lower().strip()
-        correct_lower = correct_answer.lower().strip()
+    def evaluate_batch(self, quiz: Dict, submissions: List[Dict]) -> List[Dict]:
+        """Évaluer en une fois plusieurs copies du même quiz
 
-        # Extraire les mots-clés de la réponse correcte
-        keywords = set(re.findall(r"\b\w{4,}\b", correct_lower))
-        user_words = set(re.findall(r"\b\w{4,}\b", user_lower))
+        Le corrigé est compilé en tableaux, puis toutes les copies sont
+        notées avec NumPy (barèmes, points, compétences). Le résultat de
+        chaque copie est identique à celui d'evaluate_quiz.
 
-        # Calculer le pourcentage de mots-clés présents
-        if not keywords:
-            return False
-
-        match_percentage = len(keywords & user_words) / len(keywords)
+        Les réponses sont indexées par numéro de question (int) ; les clés
+        "0", "1"... d'une copie relue depuis du JSON sont converties.
+        """
+        if not submissions:
+            return []
+        questions = quiz["questions"]
+        if not questions:
+            return [self.evaluate_quiz(quiz, answers) for answers in submissions]
+        n, m = len(submissions), len(questions)
+        total_points = sum(q.get("points", 1) for q in questions)
 
-        return match_percentage >= 0.6  # 60% de correspondance
+        # Corrigé compilé
+        points = np.array([q.get("points", 1) for q in questions], dtype=float)
+        is_qcm = np.array([q["type"] == "qcm" for q in questions], dtype=bool)
+        keys = np.empty(m, dtype=object)
+        keys[:] = [str(q["correct_answer"]).strip() for q in questions]
+        competences = list(
+            dict.fromkeys(q.get("competence", "Général") for q in questions)
+        )
+        competence_idx = np.array(
+            [competences.index(q.get("competence", "Général")) for q in questions]
+        )
+
+        matchers = {
+            idx: self._open_matcher(q["correct_answer"], q.get("key_phrases"))
+            for idx, q in enumerate(questions)
+            if q["type"] != "qcm"
+        }
 
-    def get_quiz_statistics(self, quiz_results: List[Dict]) -> Dict:
-        """Obtenir des statistiques globales"""
-        if not quiz_results:
+        # Copies : réponses QCM normalisées, questions ouvertes corrigées
+        qcm_flags = is_qcm.tolist()
+        answered_rows, given_rows, open_rows = [], [], []
+        for user_answers in submissions:
+            answered_row, given_row, open_row = [False] * m, [None] * m, [False] * m
+            for idx, answer in user_answers.items():
+                if isinstance(idx, str) and idx.isdecimal():
+                    idx = int(idx)
+                if not isinstance(idx, (int, np.integer)) or not 0 <= idx < m:
+                    continue
+                answered_row[idx] = True
+                if qcm_flags[idx]:
+                    given_row[idx] = str(answer).strip()
+                else:
+                    open_row[idx] = matchers[idx].matches(str(answer))
+            answered_rows.append(answered_row)
+            given_rows.append(given_row)
+            open_rows.append(open_row)
+        answered = np.array(answered_rows, dtype=bool)
+        open_correct = np.array(open_rows, dtype=bool)
+        given = np.empty((n, m), dtype=object)
+        given[:] = given_rows
+
+        correct = answered & np.where(is_qcm, given == keys, open_correct)
+        wrong = answered & ~correct
+        earned = np.where(correct, points, 0.0)
+        if quiz["bareme"] == "Points négatifs":
+            earned = np.where(wrong & is_qcm, -points * 0.25, earned)
+        elif quiz["bareme"] == "Partiel":
+            earned = np.where(wrong & ~is_qcm, points * 0.5, earned)
+
+        # Sommes cumulées : même ordre d'addition que la boucle d'evaluate_quiz
+        earned_points = np.cumsum(np.maximum(earned, 0), axis=1)[:, -1]
+        # Masque (copie, compétence, question) des questions répondues
+        by_competence = answered[:, None, :] & (
+            competence_idx[None, :] == np.arange(len(competences))[:, None]
+        )
+        competence_earned = np.cumsum(
+            np.where(by_competence, earned[:, None, :], 0.0), axis=2
+        )[:, :, -1]
+        competence_total = np.cumsum(np.where(by_competence, points, 0.0), axis=2)[
+            :, :, -1
+        ]
+        # Ordre des compétences : première question répondue de chacune
+        first_answered = np.where(by_competence, np.arange(m), m).min(axis=2)
+        correct_answers = correct.sum(axis=1)
+
+        if total_points > 0:
+            scores = (earned_points / total_points * 20).tolist()
+            percentages = (earned_points / total_points * 100).tolist()
+        else:
+            scores = percentages = [0] * n
+        competence_order = np.argsort(first_answered, axis=1, kind="stable")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            competence_percent = competence_earned / competence_total * 100
+
+        results = []
+        for row in range(n):
+            breakdown = {}
+            for c in competence_order[row].tolist():
+                if first_answered[row, c] == m:
+                    break
+                breakdown[competences[c]] = (
+                    float(competence_percent[row, c])
+                    if competence_total[row, c] > 0
+                    else 0
+                )
+            results.append(
+                {
+                    "quiz_id": quiz["id"],
+                    "score": scores[row],
+                    "percentage": percentages[row],
+                    "earned_points": float(earned_points[row]),
+                    "total_points": total_points,
+                    "correct_answers": int(correct_answers[row]),
+                    "total_questions": m,
+                    "competence_breakdown": breakdown,
+                    "weak_areas": [
+                        questions[idx]["question"][:50] + "..."
+                        for idx in np.flatnonzero(wrong[row])[:5].tolist()
+                    ],
+                }
+            )
+        return results
+
+    def _evaluate_open_question(
+        self, user_answer: str, correct_answer: str, key_phrases: List[str] = None
+    ) -> bool:
+        """Évaluer une question ouverte par mots-clés (correcteur compilé en cache)"""
+        return self._open_matcher(correct_answer, key_phrases).matches(str(user_answer))
+
+    def _open_matcher(self, correct_answer: str, key_phrases: List[str] = None):
+        return matcher_for(
+            correct_answer,
+            key_phrases,
+            fold=Config.OPEN_ANSWER_FOLD_ACCENTS,
+            stemming=Config.OPEN_ANSWER_STEMMING,
+        )
+
+    def get_quiz_statistics(
+        self, quiz_results: List[Dict], stats: Optional[QuizStatistics] = None
+    ) -> Dict:
+        """Obtenir des statistiques globales
+
+        Avec `stats` (statistiques cumulées), aucun parcours des résultats.
+        """
+        if stats is None:
+            stats = QuizStatistics(quiz_results)
+        if not stats.count:
             return {}
 
-        total = len(quiz_results)
-        avg_score = sum(r["score"] for r in quiz_results) / total
-        avg_percentage = sum(r["percentage"] for r in quiz_results) / total
-
-        # Meilleur et pire score
-        best = max(quiz_results, key=lambda x: x["score"])
-        worst = min(quiz_results, key=lambda x: x["score"])
-
         return {
-            "total_quizzes": total,
-            "average_score": avg_score,
-            "average_percentage": avg_percentage,
-            "best_score": best["score"],
-            "worst_score": worst["score"],
-            "improvement": (
-                (quiz_results[-1]["score"] - quiz_results[0]["score"])
-                if total > 1
-                else 0
-            ),
+            "total_quizzes": stats.count,
+            "average_score": stats.average_score,
+            "average_percentage": stats.average_percentage,
+            "best_score": stats.best_score,
+            "worst_score": stats.worst_score,
+            "improvement": stats.improvement,
         }
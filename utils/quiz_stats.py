@@ -0,0 +1,115 @@
+from typing import Dict, Iterable, List, Optional
+import streamlit as st
+
+# Bornes basses des mentions (score /20), de la meilleure à la plus faible
+MENTIONS = [
+    ("Excellent (≥16)", 16),
+    ("Très Bien (14-16)", 14),
+    ("Bien (12-14)", 12),
+    ("Assez Bien (10-12)", 10),
+    ("Insuffisant (<10)", float("-inf")),
+]
+# Compétence considérée comme faible en dessous de ce pourcentage
+WEAK_COMPETENCE_THRESHOLD = 60
+_WEAK_PREFIX = 5
+
+
+class QuizStatistics:
+    """Statistiques cumulées des résultats de quiz
+
+    Mises à jour à chaque résultat ajouté (`add`) : les vues lisent les
+    agrégats sans reparcourir tout l'historique.
+    """
+
+    def __init__(self, results: Iterable[Dict] = ()):
+        self.count = 0
+        self.score_sum = 0
+        self.percentage_sum = 0
+        self.duration_sum = 0
+        self.best_score: Optional[float] = None
+        self.worst_score: Optional[float] = None
+        self.first: Optional[Dict] = None
+        self.last: Optional[Dict] = None
+        self.mentions: Dict[str, int] = {label: 0 for label, _ in MENTIONS}
+        # Compétence -> [nombre, somme des pourcentages]
+        self.competences: Dict[str, List[float]] = {}
+        # Premiers points faibles rencontrés (compétences < 60 %, questions)
+        self.weak_competences: List[str] = []
+        self.weak_questions: List[str] = []
+        for result in results:
+            self.add(result)
+
+    def add(self, result: Dict):
+        score = result.get("score", 0)
+        self.count += 1
+        self.score_sum += score
+        self.percentage_sum += result.get("percentage", 0)
+        self.duration_sum += result.get("duration", 0)
+        if self.best_score is None or score > self.best_score:
+            self.best_score = score
+        if self.worst_score is None or score < self.worst_score:
+            self.worst_score = score
+        if self.first is None:
+            self.first = result
+        self.last = result
+
+        for label, lower in MENTIONS:
+            if score >= lower:
+                self.mentions[label] += 1
+                break
+
+        for comp, value in (result.get("competence_breakdown") or {}).items():
+            running = self.competences.setdefault(comp, [0, 0])
+            running[0] += 1
+            running[1] += value
+            if (
+                value < WEAK_COMPETENCE_THRESHOLD
+                and len(self.weak_competences) < _WEAK_PREFIX
+            ):
+                self.weak_competences.append(comp)
+        if len(self.weak_questions) < _WEAK_PREFIX:
+            self.weak_questions.extend(
+                result.get("weak_areas", [])[: _WEAK_PREFIX - len(self.weak_questions)]
+            )
+
+    @property
+    def average_score(self) -> float:
+        return self.score_sum / self.count if self.count else 0
+
+    @property
+    def average_percentage(self) -> float:
+        return self.percentage_sum / self.count if self.count else 0
+
+    @property
+    def improvement(self) -> float:
+        if self.count < 2:
+            return 0
+        return self.last["score"] - self.first["score"]
+
+    def competence_averages(self) -> Dict[str, float]:
+        """Pourcentage moyen par compétence (ordre de première apparition)"""
+        return {comp: total / n for comp, (n, total) in self.competences.items()}
+
+    def weak_areas(self, limit: int = _WEAK_PREFIX) -> List[str]:
+        """Compétences faibles puis questions ratées, dans l'ordre d'apparition"""
+        return (self.weak_competences + self.weak_questions)[:limit]
+
+
+def session_statistics() -> QuizStatistics:
+    """Statistiques des résultats de la session, tenues à jour
+
+    Seuls les résultats ajoutés depuis le dernier appel sont intégrés ;
+    l'historique n'est reparcouru que s'il a été remplacé.
+    """
+    results = st.session_state.get("quiz_results", [])
+    stats = st.session_state.get("quiz_stats")
+    if (
+        stats is None
+        or stats.count > len(results)
+        or (stats.count and results[stats.count - 1] is not stats.last)
+    ):
+        stats = QuizStatistics()
+    for result in results[stats.count :]:
+        stats.add(result)
+    st.session_state.quiz_stats = stats
+    return stats
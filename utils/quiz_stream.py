@@ -0,0 +1,68 @@
+import random
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class QuizStream:
+    """Recevoir les questions d'un quiz en arrière-plan
+
+    Un thread consomme l'itérateur de questions (ex: AIGenerator.stream_quiz)
+    et les ajoute à `questions`, ce qui permet de commencer le quiz dès la
+    première question reçue.
+    """
+
+    def __init__(
+        self,
+        questions_iter: Iterator[Dict[str, Any]],
+        prepare: Optional[Callable[[Dict[str, Any]], None]] = None,
+        shuffle: bool = False,
+    ):
+        self.questions: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self._iter = questions_iter
+        self._prepare = prepare
+        self._shuffle = shuffle
+        # Les questions avant cet index ont déjà été vues : elles ne bougent plus
+        self._locked_until = 1
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "QuizStream":
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for question in self._iter:
+                if self._prepare:
+                    self._prepare(question)
+                with self._cond:
+                    if self._shuffle and len(self.questions) >= self._locked_until:
+                        # Insertion aléatoire parmi les questions pas encore vues
+                        position = random.randint(
+                            self._locked_until, len(self.questions)
+                        )
+                        self.questions.insert(position, question)
+                    else:
+                        self.questions.append(question)
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self.done = True
+                self._cond.notify_all()
+
+    def lock_until(self, idx: int):
+        """Figer l'ordre des questions jusqu'à l'index idx (exclu)"""
+        with self._cond:
+            self._locked_until = max(self._locked_until, idx)
+
+    def wait_for(self, count: int, timeout: Optional[float] = None) -> bool:
+        """Attendre qu'au moins `count` questions soient reçues (ou la fin)"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: len(self.questions) >= count or self.done, timeout
+            )
+            return len(self.questions) >= count
@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional
+from config import Config
+
+
+def recommendations_fingerprint(
+    quiz_count: int,
+    average_score: float,
+    weak_areas: List[str],
+    provider: str,
+    model: str,
+) -> Dict[str, Any]:
+    """Empreinte des données réellement envoyées dans le prompt
+
+    Le prompt ne contient que le nombre de quiz, la moyenne à 0,1 près et
+    les trois premiers points faibles.
+    """
+    return {
+        "quiz_count": quiz_count,
+        "average_score": round(average_score, 1),
+        "weak_areas": list(weak_areas[:3]),
+        "provider": provider,
+        "model": model,
+    }
+
+
+def is_stale(
+    entry: Optional[Dict],
+    fingerprint: Dict[str, Any],
+    max_new_results: Optional[int] = None,
+    score_tolerance: Optional[float] = None,
+) -> bool:
+    """Les recommandations enregistrées doivent-elles être régénérées ?
+
+    Elles restent valables tant que le modèle et les points faibles
+    classés sont les mêmes, que la moyenne a bougé de moins de
+    `score_tolerance` et que moins de `max_new_results` quiz ont été faits.
+    """
+    if max_new_results is None:
+        max_new_results = Config.RECOMMENDATIONS_MAX_NEW_RESULTS
+    if score_tolerance is None:
+        score_tolerance = Config.RECOMMENDATIONS_SCORE_TOLERANCE
+    if not entry or not entry.get("recommendations"):
+        return True
+    previous = entry.get("fingerprint") or {}
+    for key in ("provider", "model", "weak_areas"):
+        if previous.get(key) != fingerprint[key]:
+            return True
+    new_results = fingerprint["quiz_count"] - previous.get("quiz_count", 0)
+    if new_results < 0 or new_results >= max_new_results:
+        return True
+    drift = abs(fingerprint["average_score"] - previous.get("average_score", 0))
+    return drift >= score_tolerance
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class ResponseCache:
+    """Cache persistant (SQLite) des réponses des modèles
+
+    Les entrées expirent après `ttl_seconds` et les moins récemment utilisées
+    sont supprimées au-delà de `max_entries`.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_last_access "
+            "ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        provider: str, model: str, prompt: str, max_tokens: int, temperature: float
+    ) -> str:
+        """Clé de cache : provider, modèle, hash du prompt et paramètres"""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{provider}|{model}|{prompt_hash}|{max_tokens}|{temperature}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Retourner la réponse en cache si elle existe et n'a pas expiré"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            return response
+
+    def put(self, key: str, response: str):
+        """Enregistrer une réponse puis appliquer la politique d'éviction"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Vider le cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional
+
+
+class ResultLog:
+    """Journal des résultats de quiz en ajout seul (JSON lines)
+
+    Chaque résultat est une ligne ajoutée à `<name>.log.jsonl` : le coût
+    d'une sauvegarde ne dépend pas de la longueur de l'historique. Le
+    compactage (en arrière-plan) fusionne le journal dans l'instantané
+    `<name>.jsonl` en écartant les lignes illisibles et les doublons.
+    """
+
+    def __init__(
+        self, data_dir: str, name: str = "quiz_results", compact_every: int = 200
+    ):
+        self.snapshot_path = os.path.join(data_dir, f"{name}.jsonl")
+        self.log_path = os.path.join(data_dir, f"{name}.log.jsonl")
+        # Journal en cours de compactage (lisible jusqu'à la fin de l'opération)
+        self.pending_path = os.path.join(data_dir, f"{name}.compacting.jsonl")
+        self.legacy_path = os.path.join(data_dir, f"{name}.json")
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._count: Optional[int] = None
+        self._log_lines: Optional[int] = None
+        self._import_legacy()
+
+    def _import_legacy(self):
+        """Reprendre une seule fois l'ancien fichier JSON (liste complète)"""
+        if os.path.exists(self.snapshot_path) or not os.path.exists(self.legacy_path):
+            return
+        with open(self.legacy_path, "r", encoding="utf-8") as f:
+            results = json.load(f)
+        self._write_file(self.snapshot_path + ".tmp", results)
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+    def _segments(self) -> List[str]:
+        return [self.snapshot_path, self.pending_path, self.log_path]
+
+    @staticmethod
+    def _read_lines(path: str) -> Iterator[Dict]:
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Ligne tronquée par un arrêt brutal : ignorée
+                    continue
+
+    @staticmethod
+    def _reversed_lines(path: str, block_size: int = 8192) -> Iterator[str]:
+        """Lignes d'un fichier, de la dernière à la première"""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b""
+            while position > 0:
+                step = min(block_size, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + remainder).split(b"\n")
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line.decode("utf-8")
+            if remainder.strip():
+                yield remainder.decode("utf-8")
+
+    @staticmethod
+    def _write_file(path: str, results: List[Dict]):
+        with open(path, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def append(self, result: Dict):
+        """Ajouter un résultat (une ligne) ; compacte en arrière-plan si besoin"""
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._count is not None:
+                self._count += 1
+            if self._log_lines is None:
+                self._log_lines = sum(1 for _ in self._read_lines(self.log_path))
+            else:
+                self._log_lines += 1
+            needs_compaction = self._log_lines >= self.compact_every
+        if needs_compaction:
+            self.compact_in_background()
+
+    def read_all(self) -> List[Dict]:
+        """Tous les résultats, du plus ancien au plus récent"""
+        with self._lock:
+            results = [r for path in self._segments() for r in self._read_lines(path)]
+            self._count = len(results)
+            if self._log_lines is None:
+                self._log_lines = sum(1 for _ in self._read_lines(self.log_path))
+        return results
+
+    def iter_all(self) -> Iterator[Dict]:
+        """Parcourir les résultats sans les charger tous en mémoire"""
+        # Le compactage ne doit pas remplacer les fichiers pendant la lecture ;
+        # les ajouts continuent (une ligne incomplète est ignorée)
+        with self._compact_lock:
+            for path in self._segments():
+                yield from self._read_lines(path)
+
+    def tail(self, k: int) -> List[Dict]:
+        """Les k derniers résultats, lus depuis la fin des fichiers"""
+        results: List[Dict] = []
+        with self._lock:
+            for path in reversed(self._segments()):
+                if len(results) >= k:
+                    break
+                for line in self._reversed_lines(path):
+                    if len(results) >= k:
+                        break
+                    try:
+                        results.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        results.reverse()
+        return results
+
+    def count(self) -> int:
+        if self._count is None:
+            self.read_all()
+        return self._count
+
+    def rewrite(self, results: List[Dict]):
+        """Remplacer tout l'historique (cas rare : suppression, correction)"""
+        tmp_path = self.snapshot_path + ".tmp"
+        with self._compact_lock, self._lock:
+            self._write_file(tmp_path, results)
+            os.replace(tmp_path, self.snapshot_path)
+            for path in (self.pending_path, self.log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._count = len(results)
+            self._log_lines = 0
+
+    def compact(self):
+        """Fusionner le journal dans l'instantané
+
+        Le journal est d'abord renommé : les ajouts continuent pendant la
+        fusion, qui écarte les doublons (même quiz_id et end_time).
+        """
+        with self._compact_lock:
+            with self._lock:
+                if not os.path.exists(self.pending_path):
+                    if not os.path.exists(self.log_path):
+                        return
+                    os.replace(self.log_path, self.pending_path)
+                self._log_lines = 0
+
+            seen = set()
+            merged = []
+            for path in (self.snapshot_path, self.pending_path):
+                for result in self._read_lines(path):
+                    key = (result.get("quiz_id"), result.get("end_time"))
+                    if key != (None, None):
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    merged.append(result)
+            tmp_path = self.snapshot_path + ".tmp"
+            self._write_file(tmp_path, merged)
+
+            with self._lock:
+                os.replace(tmp_path, self.snapshot_path)
+                os.remove(self.pending_path)
+                self._count = None
+
+    def compact_in_background(self):
+        """Lancer le compactage dans un thread s'il n'est pas déjà en cours"""
+        if self._compact_lock.locked():
+            return
+        threading.Thread(target=self.compact, daemon=True).start()
+
+
+_logs: Dict[str, ResultLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_result_log(
+    data_dir: str, name: str = "quiz_results", compact_every: int = 200
+) -> ResultLog:
+    """Journal partagé par fichier : un seul jeu de verrous par chemin
+
+    Deux instances sur les mêmes fichiers compacteraient en parallèle et
+    perdraient des résultats.
+    """
+    key = os.path.abspath(os.path.join(data_dir, name))
+    with _logs_lock:
+        if key not in _logs:
+            _logs[key] = ResultLog(data_dir, name, compact_every)
+        return _logs[key]
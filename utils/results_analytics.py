@@ -0,0 +1,183 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+from utils.charts import series_trace
+
+MENTION_COLORS = ["#2ecc71", "#3498db", "#f39c12", "#e67e22", "#e74c3c"]
+
+
+class ResultsSnapshot:
+    """Résultats de quiz accompagnés d'une empreinte de version
+
+    L'historique ne fait que s'allonger : (utilisateur, nombre de résultats,
+    date du dernier) change dès qu'un résultat est ajouté. Les calculs mis
+    en cache sont indexés sur cette empreinte, pas sur le contenu.
+    """
+
+    def __init__(self, results: List[Dict], user_id: Optional[str] = None):
+        self.results = results
+        last = results[-1].get("end_time") if results else None
+        self.key: Tuple = (user_id, len(results), last)
+
+
+_SNAPSHOT_HASH = {ResultsSnapshot: lambda snapshot: snapshot.key}
+
+
+def results_snapshot() -> ResultsSnapshot:
+    return ResultsSnapshot(
+        st.session_state.get("quiz_results", []), st.session_state.get("user_id")
+    )
+
+
+@st.cache_data(hash_funcs=_SNAPSHOT_HASH, max_entries=64)
+def score_series(snapshot: ResultsSnapshot) -> np.ndarray:
+    """Scores successifs (/20), dans l'ordre des quiz"""
+    return np.fromiter(
+        (r["score"] for r in snapshot.results), dtype=float, count=len(snapshot.results)
+    )
+
+
+def _window(scores: np.ndarray, window: Optional[Tuple[int, int]]):
+    """Numéros de quiz (à partir de 1) et scores de la plage demandée"""
+    start, end = window or (1, len(scores))
+    return np.arange(start, end + 1), scores[start - 1 : end]
+
+
+@st.cache_data(hash_funcs=_SNAPSHOT_HASH, max_entries=64)
+def evolution_figure(
+    snapshot: ResultsSnapshot, window: Optional[Tuple[int, int]] = None
+) -> go.Figure:
+    numbers, scores = _window(score_series(snapshot), window)
+    fig = go.Figure()
+    fig.add_trace(
+        series_trace(
+            numbers,
+            scores,
+            mode="lines+markers",
+            name="Score",
+            line=dict(color="#1f77b4", width=3),
+            marker=dict(size=10),
+        )
+    )
+    fig.add_hline(
+        y=10,
+        line_dash="dash",
+        line_color="red",
+        annotation_text="Seuil de réussite",
+    )
+    fig.update_layout(
+        xaxis_title="Quiz",
+        yaxis_title="Score (/20)",
+        yaxis_range=[0, 20],
+        height=400,
+    )
+    return fig
+
+
+@st.cache_data(hash_funcs=_SNAPSHOT_HASH, max_entries=64)
+def score_projection(snapshot: ResultsSnapshot, horizon: int = 5) -> np.ndarray:
+    """Scores projetés des `horizon` prochains quiz (tendance linéaire)"""
+    scores = score_series(snapshot)
+    x = np.arange(len(scores))
+    trend = np.poly1d(np.polyfit(x, scores, 1))
+    return trend(np.arange(len(scores), len(scores) + horizon))
+
+
+@st.cache_data(hash_funcs=_SNAPSHOT_HASH, max_entries=64)
+def projection_figure(
+    snapshot: ResultsSnapshot, window: Optional[Tuple[int, int]] = None
+) -> go.Figure:
+    scores = score_series(snapshot)
+    future_scores = score_projection(snapshot)
+    numbers, shown = _window(scores, window)
+    fig = go.Figure()
+
+    # Scores réels
+    fig.add_trace(
+        series_trace(
+            numbers,
+            shown,
+            mode="lines+markers",
+            name="Scores Réels",
+            line=dict(color="#1f77b4", width=3),
+        )
+    )
+
+    # Projection
+    fig.add_trace(
+        go.Scatter(
+            x=list(range(len(scores) + 1, len(scores) + len(future_scores) + 1)),
+            y=future_scores,
+            mode="lines+markers",
+            name="Projection",
+            line=dict(color="#2ecc71", width=2, dash="dash"),
+        )
+    )
+
+    fig.add_hline(
+        y=10, line_dash="dash", line_color="red", annotation_text="Seuil de réussite"
+    )
+
+    fig.update_layout(
+        title="Projection de vos performances",
+        xaxis_title="Numéro du Quiz",
+        yaxis_title="Score (/20)",
+        yaxis_range=[0, 20],
+        height=400,
+    )
+    return fig
+
+
+@st.cache_data(max_entries=64)
+def mentions_figure(mentions: Dict[str, int]) -> go.Figure:
+    fig = go.Figure(
+        data=[
+            go.Pie(
+                labels=list(mentions.keys()),
+                values=list(mentions.values()),
+                hole=0.3,
+                marker_colors=MENTION_COLORS,
+            )
+        ]
+    )
+    fig.update_layout(height=400)
+    return fig
+
+
+@st.cache_data(max_entries=1024)
+def competence_bar_figure(breakdown: Dict[str, float]) -> go.Figure:
+    """Barres des scores par compétence d'un quiz"""
+    df_comp = pd.DataFrame(
+        [{"Compétence": k, "Score": v} for k, v in breakdown.items()]
+    )
+    fig = px.bar(
+        df_comp,
+        x="Compétence",
+        y="Score",
+        color="Score",
+        color_continuous_scale="RdYlGn",
+    )
+    fig.update_layout(height=300)
+    return fig
+
+
+@st.cache_data(max_entries=64)
+def competence_radar_figure(averages: Dict[str, float]) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatterpolar(
+            r=list(averages.values()),
+            theta=list(averages.keys()),
+            fill="toself",
+            name="Vos Performances",
+        )
+    )
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        showlegend=True,
+        height=500,
+    )
+    return fig
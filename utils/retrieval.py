@@ -0,0 +1,150 @@
+import re
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from config import Config
+from utils.document_processor import DocumentProcessor
+
+_TOKEN_RE = re.compile(r"\b\w{3,}\b")
+
+
+def tokenize(text: str) -> List[str]:
+    """Découper un texte en termes (minuscules, 3 lettres minimum)"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class DocumentIndex:
+    """Index lexical BM25 des chunks d'un document
+
+    Les postings sont stockés par terme dans des tableaux NumPy contigus
+    (format CSC : indptr / chunk_ids / tf), ce qui rend la construction et
+    les requêtes rapides même pour des documents de plusieurs centaines de
+    pages.
+    """
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        chunk_ids: List[int] = []
+        lengths = np.zeros(len(chunks), dtype=np.float64)
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            lengths[chunk_id] = len(tokens)
+            for token in tokens:
+                term_ids.append(vocab.setdefault(token, len(vocab)))
+                chunk_ids.append(chunk_id)
+
+        self.vocab = vocab
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(chunks) else 0.0
+
+        # Compter les occurrences (terme, chunk) puis trier par terme
+        n_chunks = max(1, len(chunks))
+        pairs = np.asarray(term_ids, dtype=np.int64) * n_chunks + np.asarray(
+            chunk_ids, dtype=np.int64
+        )
+        unique_pairs, tf = np.unique(pairs, return_counts=True)
+        self.postings_terms = unique_pairs // n_chunks
+        self.postings_chunks = unique_pairs % n_chunks
+        self.postings_tf = tf.astype(np.float64)
+        self.indptr = np.searchsorted(self.postings_terms, np.arange(len(vocab) + 1))
+
+        doc_freq = np.diff(self.indptr).astype(np.float64)
+        self.idf = np.log(1 + (len(chunks) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    @classmethod
+    def from_text(cls, text: str, chunk_words: Optional[int] = None) -> "DocumentIndex":
+        """Construire l'index à partir du texte complet d'un document"""
+        chunk_words = chunk_words or Config.RETRIEVAL_CHUNK_WORDS
+        return cls(DocumentProcessor.chunk_text(text, chunk_words, chunk_words // 10))
+
+    def score(self, query: str) -> np.ndarray:
+        """Scores BM25 de chaque chunk pour la requête"""
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / (self.avg_length or 1))
+        for token in set(tokenize(query)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            chunk_ids = self.postings_chunks[start:end]
+            tf = self.postings_tf[start:end]
+            scores[chunk_ids] += (
+                self.idf[term_id] * tf * (self.k1 + 1) / (tf + norm[chunk_ids])
+            )
+        return scores
+
+    def top_terms(self, n: int = 20) -> List[str]:
+        """Termes les plus caractéristiques du document (tf-idf cumulé)"""
+        if not self.vocab:
+            return []
+        weights = (
+            np.bincount(
+                self.postings_terms, weights=self.postings_tf, minlength=len(self.vocab)
+            )
+            * self.idf
+        )
+        terms = list(self.vocab)
+        return [terms[i] for i in np.argsort(weights)[::-1][:n]]
+
+    def select_context(
+        self,
+        budget_chars: int,
+        query: Optional[str] = None,
+        part: Optional[Tuple[int, int]] = None,
+    ) -> str:
+        """Choisir des chunks pertinents et variés tenant dans budget_chars
+
+        Sans requête, le document est découpé en segments réguliers et le
+        chunk le plus riche en termes-clés de chaque segment est retenu, ce
+        qui couvre tout le document. Avec une requête, les meilleurs chunks
+        sont retenus en évitant les chunks voisins d'un chunk déjà choisi.
+        `part=(i, n)` limite la sélection à la i-ème des n tranches du
+        document. Les chunks sont rendus dans l'ordre du document.
+        """
+        if not self.chunks:
+            return ""
+
+        low, high = 0, len(self.chunks)
+        if part is not None:
+            i, n = part
+            low = len(self.chunks) * i // n
+            high = max(low + 1, len(self.chunks) * (i + 1) // n)
+            high = min(high, len(self.chunks))
+            low = min(low, high - 1)
+
+        avg_chars = sum(len(c) for c in self.chunks) / len(self.chunks)
+        slots = max(1, min(high - low, int(budget_chars // max(avg_chars, 1))))
+
+        if query:
+            scores = self.score(query)[low:high]
+            selected: List[int] = []
+            for offset in np.argsort(scores)[::-1]:
+                if len(selected) >= slots:
+                    break
+                chunk_id = low + int(offset)
+                if all(abs(chunk_id - s) > 1 for s in selected):
+                    selected.append(chunk_id)
+        else:
+            scores = self.score(" ".join(self.top_terms()))
+            bounds = np.linspace(low, high, slots + 1).astype(int)
+            selected = [
+                int(start + np.argmax(scores[start:end]))
+                for start, end in zip(bounds[:-1], bounds[1:])
+                if end > start
+            ]
+
+        parts = []
+        used = 0
+        for chunk_id in sorted(selected):
+            chunk = self.chunks[chunk_id]
+            if used + len(chunk) > budget_chars:
+                chunk = chunk[: max(0, budget_chars - used)]
+            if not chunk:
+                break
+            parts.append(chunk)
+            used += len(chunk)
+        return "\n[...]\n".join(parts)
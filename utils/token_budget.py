@@ -0,0 +1,80 @@
+from typing import List
+from config import Config
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken est optionnel
+    _encoding = None
+
+# Estimation sans tokenizer : ~3.5 caractères par token pour du français
+CHARS_PER_TOKEN = 3.5
+
+# Tokens de sortie estimés par élément généré
+TOKENS_PER_QUESTION = 220
+SUMMARY_OUTPUT_TOKENS = 3500
+RECOMMENDATIONS_OUTPUT_TOKENS = 1500
+CHUNK_SUMMARY_OUTPUT_TOKENS = 800
+
+# Contexte document souhaité par question (plus de questions = plus de matière)
+CONTEXT_TOKENS_PER_QUESTION = 250
+MIN_CONTEXT_TOKENS = 1200
+# Au-delà de ce contexte, le résumé passe en mode map-reduce
+SUMMARY_CONTEXT_TOKENS = 4000
+
+# Marge pour l'écart entre l'estimation et le tokenizer réel du modèle
+SAFETY_MARGIN = 0.1
+
+
+def count_tokens(text: str) -> int:
+    """Compter (ou estimer) le nombre de tokens d'un texte"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def tokens_to_chars(tokens: int) -> int:
+    """Nombre de caractères correspondant approximativement à `tokens`"""
+    return int(max(0, tokens) * CHARS_PER_TOKEN)
+
+
+class TokenBudget:
+    """Dimensionner contexte et max_tokens d'une requête selon le modèle
+
+    Les limites retenues sont les plus petites de la chaîne de providers,
+    pour qu'une requête reste valide après un repli.
+    """
+
+    def __init__(self, providers: List[str]):
+        limits = [Config.MODEL_LIMITS[p] for p in providers if p in Config.MODEL_LIMITS]
+        self.context_window = min(
+            (lim["context_window"] for lim in limits), default=16000
+        )
+        self.max_output = min((lim["max_output"] for lim in limits), default=4096)
+
+    def output_tokens(self, estimate: int) -> int:
+        """max_tokens pour une sortie estimée, avec marge, plafonné par le modèle"""
+        return min(self.max_output, int(estimate * (1 + SAFETY_MARGIN)) + 100)
+
+    def quiz_output_tokens(self, num_questions: int) -> int:
+        return self.output_tokens(num_questions * TOKENS_PER_QUESTION)
+
+    def questions_fitting(self) -> int:
+        """Nombre de questions que le modèle peut produire en une réponse"""
+        usable = (self.max_output - 100) / (1 + SAFETY_MARGIN)
+        return max(1, int(usable // TOKENS_PER_QUESTION))
+
+    def context_chars(self, prompt_template: str, max_tokens: int, wanted: int) -> int:
+        """Caractères de document à inclure dans le prompt
+
+        `wanted` est le contexte souhaité (tokens) ; il est réduit pour que
+        gabarit + contexte + sortie tiennent dans la fenêtre du modèle.
+        """
+        available = self.context_window * (1 - SAFETY_MARGIN)
+        available -= count_tokens(prompt_template) + max_tokens
+        tokens = min(wanted, Config.MAX_CONTEXT_TOKENS, int(available))
+        return tokens_to_chars(tokens)
+
+    def quiz_context_tokens(self, num_questions: int) -> int:
+        return max(MIN_CONTEXT_TOKENS, num_questions * CONTEXT_TOKENS_PER_QUESTION)